@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('resources', 'resources'), ('config.txt', '.'), ('custom_hooks.py', '.')],
-    hiddenimports=['utils.config_manager', 'bird_detector_app.app', 'bird_detector_app.detector', 'ui.components', 'ui.dialogs'],
+    hiddenimports=['utils.config_manager', 'utils.timeseries', 'bird_detector_app.app', 'bird_detector_app.backends', 'bird_detector_app.cameras', 'bird_detector_app.detector', 'bird_detector_app.export', 'bird_detector_app.history', 'bird_detector_app.loader', 'bird_detector_app.metrics', 'bird_detector_app.motion', 'bird_detector_app.overlay', 'bird_detector_app.pipeline', 'bird_detector_app.quantize', 'bird_detector_app.results_writer', 'bird_detector_app.scheduler', 'bird_detector_app.streams', 'ui.charts', 'ui.components', 'ui.dialogs'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
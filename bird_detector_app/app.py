@@ -3,28 +3,27 @@
 Creater Tz2H
 """
 
-import csv
-import gc
+import math
 import os
-from datetime import datetime
+import time
 
 import cv2
-import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from PyQt5.QtCore import QDateTime, Qt, QTimer
+from PyQt5.QtCore import QDateTime, QEvent, Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import (
     QIcon,
-    QImage,
     QPixmap,
 )
 from PyQt5.QtWidgets import (
     QAction,
+    QCheckBox,
     QComboBox,
     QDialog,
     QFileDialog,
+    QGridLayout,
     QHBoxLayout,
+    QInputDialog,
     QLabel,
     QMainWindow,
     QMenu,
@@ -36,16 +35,53 @@ from PyQt5.QtWidgets import (
     QVBoxLayout,
     QWidget,
 )
+from ui.charts import LiveDensityChart
 from ui.components import MacStyleButton, MacStyleFrame
 from ui.dialogs import DensityDialog, SettingsDialog
-from utils.config_manager import save_config
+from utils.config_manager import (
+    get_profile,
+    load_camera_cache,
+    load_initial_config,
+    save_camera_cache,
+    save_config,
+)
 
-from bird_detector_app.detector import ObjectDetector
+from bird_detector_app.cameras import CameraScanner
+from bird_detector_app.detector import set_chinese_font
+from bird_detector_app.loader import LOAD_WAIT_TIMEOUT, ModelLoader
+from bird_detector_app.metrics import MetricsWriter, stage_metrics
+from bird_detector_app.motion import MotionGate
+from bird_detector_app.pipeline import (
+    DetectionPipeline,
+    MultiCameraPipeline,
+    fit_size,
+    frame_to_qimage,
+    wait_detached_stages,
+)
+from bird_detector_app.scheduler import InferenceScheduler
+from bird_detector_app.streams import (
+    STREAM_SCHEMES,
+    file_url_to_path,
+    is_stream_url,
+)
+
+# 视频显示区域的样式，多路摄像头的每个画面使用相同样式
+VIDEO_LABEL_STYLE = """
+    QLabel {
+        background-color: rgba(0, 0, 0, 0.5);
+        border: 1px solid rgba(255, 255, 255, 0.2);
+        border-radius: 10px;
+        padding: 10px;
+    }
+"""
 
 
 class YoloVisualizationApp(QMainWindow):
     """YOLO可视化应用主窗口"""
 
+    # 摄像头列表或检测状态变化
+    cameras_updated = pyqtSignal()
+
     def __init__(self):
         """初始化主窗口"""
         super().__init__()
@@ -60,13 +96,24 @@ class YoloVisualizationApp(QMainWindow):
         self.is_detecting = False
         self.frame_count = 0
         self.fps = 0
+        # 平滑后的采集到显示延迟（秒）
+        self.display_latency = 0.0
         self.last_fps_update = QDateTime.currentDateTime()
-        self.available_cameras = self.detect_cameras()
+        # 先使用上次缓存的摄像头列表，窗口显示后再在后台重新检测
+        self.available_cameras = load_camera_cache()
+        self.scanning_cameras = False
+        self.camera_scanner = None
         self.selected_camera = None
+        # 上次打开的网络流地址，初始值读取config.txt中的stream_url
+        self.stream_url = load_initial_config()["stream_url"]
         self.last_frame_time = QDateTime.currentDateTime()
+        self.last_status_update = QDateTime.currentDateTime()
 
-        # 初始化检测器
-        self.bird_detector = ObjectDetector("resources/models/yolo11m.pt")
+        # 检测器在窗口显示后由 load_model_async 在后台线程中创建，只加载一次
+        self.bird_detector = None
+        self.model_loader = None
+        # 已被新的加载任务取代的加载线程，线程结束后关闭其加载出的检测器
+        self.stale_loaders = []
 
         # 设置应用程序样式
         self.set_application_style()
@@ -112,16 +159,28 @@ class YoloVisualizationApp(QMainWindow):
 
         # 初始化密度图类别 (默认与识别类别一致)
         self.density_classes = set(self.all_classes)
-        self.bird_detector.density_classes = set(self.all_classes)
 
-        # 初始化视频捕获
-        self.cap = None
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(1)  # 设置为1毫秒，让系统尽可能快地更新
+        # 初始化视频流水线 (采集、推理、渲染在后台线程中执行)
+        self.pipeline = None
+        self.source_is_file = False
+        # 窗口显示后检测摄像头并启动摄像头预览
+        QTimer.singleShot(0, self.refresh_cameras)
+        QTimer.singleShot(0, self.start_camera)
+
+        # 性能指标：按配置定期写入指标文件
+        config = load_initial_config()
+        self.metrics_writer = None
+        if config["metrics_file"]:
+            self.metrics_writer = MetricsWriter(
+                stage_metrics,
+                config["metrics_file"],
+                interval=config["metrics_interval"],
+            )
+            self.metrics_writer.start()
 
-        # 存储识别数据 (密度图只用时间戳和总数)
-        self.recognition_data = []  # [(timestamp, total_count, {class_name: count}), ...]
+        # 密度图类别列的缓存，逐帧数量由密度图自身的环形缓冲区保存
+        self.density_key = None
+        self.density_cache = None
 
         # 系统托盘图标
         self.create_tray_icon()
@@ -262,16 +321,19 @@ class YoloVisualizationApp(QMainWindow):
         self.video_label = QLabel("等待视频流...")
         self.video_label.setMinimumSize(640, 640)
         self.video_label.setAlignment(Qt.AlignCenter)
-        self.video_label.setStyleSheet("""
-            QLabel {
-                background-color: rgba(0, 0, 0, 0.5);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                border-radius: 10px;
-                padding: 10px;
-            }
-        """)
+        self.video_label.setStyleSheet(VIDEO_LABEL_STYLE)
         left_layout.addWidget(self.video_label)
 
+        # 多路摄像头画面网格 (默认隐藏，启动多路监控时替换单路画面)
+        self.grid_widget = QWidget()
+        self.grid_widget.setMinimumSize(640, 640)
+        self.grid_layout = QGridLayout(self.grid_widget)
+        self.grid_layout.setSpacing(10)
+        self.grid_layout.setContentsMargins(0, 0, 0, 0)
+        self.grid_labels = []
+        self.grid_widget.setVisible(False)
+        left_layout.addWidget(self.grid_widget)
+
         # 识别信息区域
         info_frame = MacStyleFrame()
         info_layout = QHBoxLayout(info_frame)
@@ -298,6 +360,20 @@ class YoloVisualizationApp(QMainWindow):
         """)
         info_layout.addWidget(self.fps_label)
 
+        # 性能面板 (各阶段耗时，默认隐藏，通过"视图"菜单打开)
+        self.metrics_label = QLabel()
+        self.metrics_label.setStyleSheet("""
+            QLabel {
+                font-family: Menlo, Consolas, monospace;
+                font-size: 12px;
+                color: #ffffff;
+            }
+        """)
+        self.metrics_label.setVisible(False)
+        info_layout.addWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics_panel)
+
         left_layout.addWidget(info_frame)
 
         # 将左侧布局添加到内容布局
@@ -348,8 +424,9 @@ class YoloVisualizationApp(QMainWindow):
 
     def init_matplotlib_canvas(self):
         """初始化matplotlib画布"""
-        self.fig, self.ax = plt.subplots()
-        self.canvas = FigureCanvas(self.fig)
+        set_chinese_font(plt)
+        # 实时密度图按固定频率增量刷新，与视频帧率无关
+        self.canvas = LiveDensityChart(metrics=stage_metrics, parent=self)
         # 移除旧的占位符布局
         old_layout = self.density_chart_placeholder.layout()
         if old_layout:
@@ -373,35 +450,23 @@ class YoloVisualizationApp(QMainWindow):
                     for line in f:
                         line = line.strip()
                         if line.startswith("model="):
+                            # 只记录模型路径，模型由 load_model_async 加载
                             model_path = line.split("=", 1)[1]
-                            if os.path.exists(model_path):
-                                self.load_model_and_classes(model_path)
-                                self.statusBar.showMessage(
-                                    f"已加载模型: {os.path.basename(model_path)}"
-                                )
-                            else:
+                            if not os.path.exists(model_path):
                                 self.statusBar.showMessage("配置中指定的模型文件不存在")
                         elif line.startswith("classes="):
                             classes_str = line.split("=", 1)[1]
                             if classes_str:
                                 self.selected_classes = set(classes_str.split(","))
-                                self.bird_detector.selected_classes = (
-                                    self.selected_classes
-                                )
                                 # 如果密度图类别未设置，默认与识别类别一致
                                 if (
                                     not hasattr(self, "density_classes")
                                     or not self.density_classes
                                 ):
                                     self.density_classes = set(self.selected_classes)
-                                    self.bird_detector.density_classes = set(
-                                        self.selected_classes
-                                    )
                             else:
                                 self.selected_classes = set()
-                                self.bird_detector.selected_classes = set()
                                 self.density_classes = set()
-                                self.bird_detector.density_classes = set()
             except Exception as e:
                 self.statusBar.showMessage(f"读取config.txt失败: {e}")
         else:
@@ -419,6 +484,21 @@ class YoloVisualizationApp(QMainWindow):
         open_action.triggered.connect(self.open_video)
         file_menu.addAction(open_action)
 
+        stream_action = QAction("打开网络流", self)
+        stream_action.setShortcut("Ctrl+U")
+        stream_action.triggered.connect(self.open_stream)
+        file_menu.addAction(stream_action)
+
+        multi_camera_action = QAction("多路摄像头监控", self)
+        multi_camera_action.setShortcut("Ctrl+M")
+        multi_camera_action.triggered.connect(self.open_multi_camera)
+        file_menu.addAction(multi_camera_action)
+
+        offline_action = QAction("离线分析视频", self)
+        offline_action.setShortcut("Ctrl+B")
+        offline_action.triggered.connect(self.open_video_offline)
+        file_menu.addAction(offline_action)
+
         save_action = QAction("保存数据", self)
         save_action.setShortcut("Ctrl+S")
         save_action.triggered.connect(self.save_data_to_csv)
@@ -439,6 +519,11 @@ class YoloVisualizationApp(QMainWindow):
         fullscreen_action.triggered.connect(self.toggle_fullscreen)
         view_menu.addAction(fullscreen_action)
 
+        metrics_action = QAction("性能面板", self)
+        metrics_action.setCheckable(True)
+        metrics_action.toggled.connect(self.toggle_metrics_panel)
+        view_menu.addAction(metrics_action)
+
         # 帮助菜单
         help_menu = menubar.addMenu("帮助")
 
@@ -490,19 +575,27 @@ class YoloVisualizationApp(QMainWindow):
         def on_model():
             # 这里只处理模型选择和识别类别
             sdlg = SettingsDialog(
-                self, self.model_path, self.all_classes, self.selected_classes
+                self,
+                self.model_path,
+                self.all_classes,
+                self.selected_classes,
+                load_initial_config()["profile"],
             )
             if sdlg.exec_():
                 model_path, selected_classes = sdlg.get_result()
-                self.load_model_and_classes(model_path)
                 self.selected_classes = selected_classes
-                self.bird_detector.selected_classes = self.selected_classes
-                # 保存到config.txt
-                save_config(model_path, selected_classes)
+                # 保存到config.txt，性能配置立即生效
+                save_config(model_path, selected_classes, profile=sdlg.get_profile())
+                self.apply_profile()
                 # 如果密度图类别未设置，默认与识别类别一致
                 if not hasattr(self, "density_classes") or not self.density_classes:
                     self.density_classes = set(selected_classes)
-                    self.bird_detector.density_classes = set(selected_classes)
+                if model_path != self.model_path or self.bird_detector is None:
+                    # 只有模型变化时才重新加载
+                    self.load_model_async(model_path)
+                else:
+                    self.bird_detector.selected_classes = self.selected_classes
+                    self.bird_detector.density_classes = self.density_classes
 
         def on_density():
             # 这里只处理密度图类别选择
@@ -510,7 +603,8 @@ class YoloVisualizationApp(QMainWindow):
             ddialog = DensityDialog(self, density_classes=list(self.selected_classes))
             if ddialog.exec_():
                 self.density_classes = ddialog.get_result()
-                self.bird_detector.density_classes = self.density_classes
+                if self.bird_detector is not None:
+                    self.bird_detector.density_classes = self.density_classes
 
         model_btn.clicked.connect(on_model)
         density_btn.clicked.connect(on_density)
@@ -520,6 +614,16 @@ class YoloVisualizationApp(QMainWindow):
     def toggle_detection(self):
         """切换检测状态"""
         self.is_detecting = not self.is_detecting
+        if self.is_detecting and self.pipeline is None:
+            if not self.start_camera():
+                self.reset_detection_button()
+                return
+        if self.pipeline is not None:
+            if self.pipeline.offline and not self.is_detecting:
+                # 停止离线分析
+                self.stop_pipeline()
+            else:
+                self.pipeline.set_detecting(self.is_detecting)
         if self.is_detecting:
             self.start_stop_button.setText("停止检测")
             self.start_stop_button.setIcon(
@@ -533,9 +637,9 @@ class YoloVisualizationApp(QMainWindow):
             )
             self.statusBar.showMessage("检测已停止")
             # 清空当前检测信息
-            if hasattr(self.bird_detector, "current_detection_info"):
-                self.bird_detector.current_detection_info = []
-            self.bird_detector.total_objects = 0
+            if self.bird_detector is not None:
+                self.bird_detector.current_counts[:] = 0
+                self.bird_detector.total_objects = 0
             self.count_label.setText("识别到的鸟类数量: 0")
 
     def open_video(self):
@@ -544,22 +648,67 @@ class YoloVisualizationApp(QMainWindow):
             self, "打开视频文件", "", "视频文件 (*.mp4 *.avi *.mkv)"
         )
         if file_path:
-            # 如果cap已打开，先释放
-            if self.cap and self.cap.isOpened():
-                self.cap.release()
-            self.cap = cv2.VideoCapture(file_path)
-            if not self.cap.isOpened():
-                self.statusBar.showMessage(
-                    f"无法打开视频文件: {os.path.basename(file_path)}"
-                )
-                self.cap = None
-            else:
-                self.statusBar.showMessage(f"已打开视频: {os.path.basename(file_path)}")
-                self.is_detecting = False  # 打开视频后停止检测
-                self.start_stop_button.setText("开始检测")
-                self.start_stop_button.setIcon(
-                    self.style().standardIcon(self.style().SP_MediaPlay)
-                )
+            # 打开视频后停止检测
+            self.reset_detection_button()
+            self.start_pipeline(file_path, is_file=True)
+            self.statusBar.showMessage(f"已打开视频: {os.path.basename(file_path)}")
+
+    def open_stream(self):
+        """打开RTSP/HTTP等网络视频流，断开后自动重连"""
+        url, ok = QInputDialog.getText(
+            self,
+            "打开网络流",
+            "网络流地址 (rtsp://、http:// 等):",
+            text=self.stream_url or "rtsp://",
+        )
+        url = url.strip()
+        if not ok or not url:
+            return
+        file_path = file_url_to_path(url)
+        if file_path is not None:
+            # file:// 地址按本地视频文件打开，与"打开视频"相同
+            if not os.path.isfile(file_path):
+                QMessageBox.warning(self, "打开网络流", f"文件不存在: {file_path}")
+                return
+            self.reset_detection_button()
+            self.start_pipeline(file_path, is_file=True)
+            self.statusBar.showMessage(f"已打开视频: {os.path.basename(file_path)}")
+            return
+        if not is_stream_url(url):
+            QMessageBox.warning(
+                self,
+                "打开网络流",
+                f"不支持的地址: {url}\n支持的前缀: {', '.join(STREAM_SCHEMES)}、file://",
+            )
+            return
+        self.stream_url = url
+        self.start_pipeline(url)
+        self.statusBar.showMessage(f"正在连接网络流: {url}")
+
+    def open_video_offline(self):
+        """以离线批量推理模式分析视频文件"""
+        if self.bird_detector is None:
+            self.statusBar.showMessage("请先加载模型")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "离线分析视频文件", "", "视频文件 (*.mp4 *.avi *.mkv)"
+        )
+        if not file_path:
+            return
+        batch_size = load_initial_config()["batch_size"]
+        self.is_detecting = True
+        self.start_pipeline(
+            file_path, is_file=True, offline=True, batch_size=batch_size
+        )
+        self.start_stop_button.setText("停止检测")
+        self.start_stop_button.setIcon(
+            self.style().standardIcon(self.style().SP_MediaStop)
+        )
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.statusBar.showMessage(
+            f"离线分析中: {os.path.basename(file_path)} (批大小 {batch_size})"
+        )
 
     def toggle_fullscreen(self):
         """切换全屏状态"""
@@ -568,6 +717,26 @@ class YoloVisualizationApp(QMainWindow):
         else:
             self.showFullScreen()
 
+    def toggle_metrics_panel(self, visible):
+        """显示或隐藏性能面板"""
+        self.metrics_label.setVisible(visible)
+        if visible:
+            self.update_metrics_panel()
+            self.metrics_timer.start(1000)
+        else:
+            self.metrics_timer.stop()
+
+    def update_metrics_panel(self):
+        """刷新性能面板：各阶段最近耗时的p50/p95"""
+        lines = []
+        for stage, summary in stage_metrics.snapshot().items():
+            if "p50_ms" in summary:
+                lines.append(
+                    f"{stage:<13}p50 {summary['p50_ms']:7.2f} ms  "
+                    f"p95 {summary['p95_ms']:7.2f} ms"
+                )
+        self.metrics_label.setText("\n".join(lines) or "暂无性能数据")
+
     def show_about(self):
         """显示关于对话框"""
         QMessageBox.about(
@@ -576,24 +745,112 @@ class YoloVisualizationApp(QMainWindow):
             "YOLO智能识别分析系统\n" "版本: 1.0.0\n" "© 2025 版权所有:睿翼智控",
         )
 
-    def detect_cameras(self):
-        """检测系统中可用的摄像头"""
-        available_cameras = []
-        for i in range(10):  # 检查前10个摄像头索引
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                ret, _ = cap.read()
-                if ret:
-                    available_cameras.append(i)
-                cap.release()
-        return available_cameras
+    def refresh_cameras(self):
+        """在后台线程中重新检测可用的摄像头"""
+        if self.scanning_cameras:
+            return
+        self.scanning_cameras = True
+        self.camera_scanner = CameraScanner(self)
+        self.camera_scanner.cameras_found.connect(self.on_cameras_found)
+        self.camera_scanner.start()
+        self.cameras_updated.emit()
+
+    def on_cameras_found(self, cameras):
+        """摄像头检测完成，更新列表并写入缓存"""
+        self.scanning_cameras = False
+        # 正在使用的摄像头无法再次打开，扫描结果中保留它们
+        cameras = sorted(set(cameras) | self.cameras_in_use())
+        self.available_cameras = cameras
+        save_camera_cache(cameras)
+        self.cameras_updated.emit()
+
+    def cameras_in_use(self):
+        """当前流水线正在使用的摄像头编号"""
+        if isinstance(self.pipeline, MultiCameraPipeline):
+            return set(self.pipeline.sources)
+        if self.pipeline is not None and isinstance(self.pipeline.source, int):
+            return {self.pipeline.source}
+        return set()
+
+    def show_multi_camera_dialog(self):
+        """选择多路监控使用的摄像头，返回摄像头编号列表，取消时返回None"""
+        dialog = QDialog(self)
+        dialog.setWindowTitle("多路摄像头监控")
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(QLabel("请选择同时监控的摄像头："))
+        checkboxes = []
+        for camera_id in self.available_cameras:
+            checkbox = QCheckBox(f"摄像头 {camera_id}")
+            checkbox.setChecked(True)
+            layout.addWidget(checkbox)
+            checkboxes.append((camera_id, checkbox))
+        if not checkboxes:
+            layout.addWidget(QLabel("未检测到可用的摄像头！"))
+
+        button_layout = QHBoxLayout()
+        ok_button = QPushButton("确定")
+        cancel_button = QPushButton("取消")
+        button_layout.addWidget(ok_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+        ok_button.setEnabled(bool(checkboxes))
+        ok_button.clicked.connect(dialog.accept)
+        cancel_button.clicked.connect(dialog.reject)
+
+        if dialog.exec_() != QDialog.Accepted:
+            return None
+        return [camera_id for camera_id, checkbox in checkboxes if checkbox.isChecked()]
+
+    def open_multi_camera(self):
+        """同时打开多路摄像头，共享一个检测器合并推理"""
+        cameras = self.show_multi_camera_dialog()
+        if not cameras:
+            return
+        self.start_multi_camera(cameras)
+        self.statusBar.showMessage(
+            f"多路监控: {', '.join(f'摄像头 {c}' for c in cameras)}"
+        )
+
+    def start_multi_camera(self, cameras):
+        """启动多路摄像头流水线，并把画面区域切换为网格"""
+        self.stop_pipeline()
+        self.source_is_file = False
+        self.pipeline = MultiCameraPipeline(
+            cameras,
+            self.bird_detector,
+            capture_size=self.current_profile()["capture_size"],
+            parent=self,
+        )
+        self.set_grid(len(cameras))
+        self.stream_totals = [0] * len(cameras)
+        self.pipeline.set_detecting(self.is_detecting)
+        self.pipeline.set_target_size(*self.label_size(self.grid_labels[0]))
+        self.update_display_enabled()
+        self.pipeline.frame_ready.connect(self.on_frame_ready)
+        self.pipeline.error.connect(self.on_pipeline_error)
+        self.pipeline.status.connect(self.statusBar.showMessage)
+        self.pipeline.finished.connect(self.on_pipeline_finished)
+        self.last_frame_time = QDateTime.currentDateTime()
+        self.pipeline.start()
+
+    def set_grid(self, count):
+        """显示count路画面的网格，count为0时恢复单路画面"""
+        for label in self.grid_labels:
+            self.grid_layout.removeWidget(label)
+            label.deleteLater()
+        self.grid_labels = []
+        columns = math.ceil(math.sqrt(count))
+        for index in range(count):
+            label = QLabel(f"摄像头 {self.pipeline.sources[index]}")
+            label.setAlignment(Qt.AlignCenter)
+            label.setStyleSheet(VIDEO_LABEL_STYLE)
+            self.grid_layout.addWidget(label, index // columns, index % columns)
+            self.grid_labels.append(label)
+        self.grid_widget.setVisible(count > 0)
+        self.video_label.setVisible(count == 0)
 
     def show_camera_selection_dialog(self):
         """显示摄像头选择对话框"""
-        if not self.available_cameras:
-            QMessageBox.warning(self, "警告", "未检测到可用的摄像头！")
-            return False
-
         dialog = QDialog(self)
         dialog.setWindowTitle("选择摄像头")
         layout = QVBoxLayout(dialog)
@@ -601,11 +858,15 @@ class YoloVisualizationApp(QMainWindow):
         # 添加说明标签
         layout.addWidget(QLabel("请选择要使用的摄像头："))
 
-        # 创建摄像头选择下拉框
+        # 创建摄像头选择下拉框和刷新按钮
+        camera_layout = QHBoxLayout()
         camera_combo = QComboBox()
-        for camera_id in self.available_cameras:
-            camera_combo.addItem(f"摄像头 {camera_id}", camera_id)
-        layout.addWidget(camera_combo)
+        refresh_button = QPushButton("刷新")
+        camera_layout.addWidget(camera_combo, 1)
+        camera_layout.addWidget(refresh_button)
+        layout.addLayout(camera_layout)
+        scan_label = QLabel()
+        layout.addWidget(scan_label)
 
         # 添加按钮
         button_layout = QHBoxLayout()
@@ -615,289 +876,340 @@ class YoloVisualizationApp(QMainWindow):
         button_layout.addWidget(cancel_button)
         layout.addLayout(button_layout)
 
+        def populate():
+            current = camera_combo.currentData()
+            camera_combo.clear()
+            for camera_id in self.available_cameras:
+                camera_combo.addItem(f"摄像头 {camera_id}", camera_id)
+            if current in self.available_cameras:
+                camera_combo.setCurrentIndex(self.available_cameras.index(current))
+            if self.scanning_cameras:
+                scan_label.setText("正在检测摄像头...")
+            elif not self.available_cameras:
+                scan_label.setText("未检测到可用的摄像头！")
+            else:
+                scan_label.setText("")
+            ok_button.setEnabled(bool(self.available_cameras))
+
+        populate()
+
         # 连接按钮信号
         ok_button.clicked.connect(dialog.accept)
         cancel_button.clicked.connect(dialog.reject)
+        refresh_button.clicked.connect(self.refresh_cameras)
+        self.cameras_updated.connect(populate)
 
         # 显示对话框
-        if dialog.exec_() == QDialog.Accepted:
+        try:
+            accepted = dialog.exec_() == QDialog.Accepted
+        finally:
+            self.cameras_updated.disconnect(populate)
+        if accepted and camera_combo.currentData() is not None:
             self.selected_camera = camera_combo.currentData()
             return True
         return False
 
-    def update_frame(self):
-        """更新视频帧并进行检测"""
-        # 计算实际FPS
+    def create_no_camera_image(self):
+        """生成摄像头未打开时的占位图像"""
+        black_image = np.zeros((640, 640, 3), dtype=np.uint8)
+        no_camera_icon_path = "resources/icons/no_camera.png"
+        if os.path.exists(no_camera_icon_path):
+            icon = cv2.imread(no_camera_icon_path, cv2.IMREAD_UNCHANGED)
+            if icon is not None:
+                # 调整图标大小并叠加到黑色背景
+                icon_height, icon_width = icon.shape[:2]
+                scale = min(400 / icon_width, 300 / icon_height)
+                resized_icon = cv2.resize(
+                    icon,
+                    (int(icon_width * scale), int(icon_height * scale)),
+                )
+                h, w = black_image.shape[:2]
+                ih, iw = resized_icon.shape[:2]
+                x = (w - iw) // 2
+                y = (h - ih) // 2
+                if resized_icon.shape[2] == 4:
+                    alpha_s = resized_icon[:, :, 3] / 255.0
+                    alpha_l = 1.0 - alpha_s
+                    for c in range(0, 3):
+                        black_image[y : y + ih, x : x + iw, c] = (
+                            alpha_s * resized_icon[:, :, c]
+                            + alpha_l * black_image[y : y + ih, x : x + iw, c]
+                        )
+                else:
+                    black_image[y : y + ih, x : x + iw] = resized_icon[:, :, :3]
+        return black_image
+
+    def show_frame(self, frame):
+        """在GUI线程中直接显示一帧图像（仅用于占位图等非流水线画面）"""
+        h, w = frame.shape[:2]
+        size = fit_size(w, h, self.label_size(self.video_label))
+        qt_image, _ = frame_to_qimage(frame, size)
+        self.video_label.setPixmap(QPixmap.fromImage(qt_image))
+
+    def label_size(self, label):
+        """画面标签除去边框和内边距后的可用尺寸 (宽, 高)"""
+        rect = label.contentsRect()
+        return rect.width(), rect.height()
+
+    def update_display_enabled(self):
+        """窗口隐藏或最小化时停止转换画面，只更新计数"""
+        if self.pipeline is not None:
+            self.pipeline.set_display_enabled(
+                self.isVisible() and not self.isMinimized()
+            )
+
+    def changeEvent(self, event):
+        """窗口最小化或恢复时更新是否转换画面"""
+        if event.type() == QEvent.WindowStateChange:
+            self.update_display_enabled()
+        super().changeEvent(event)
+
+    def showEvent(self, event):
+        """窗口显示时恢复画面转换"""
+        super().showEvent(event)
+        self.update_display_enabled()
+
+    def hideEvent(self, event):
+        """窗口隐藏 (如最小化到托盘) 时停止画面转换"""
+        super().hideEvent(event)
+        self.update_display_enabled()
+
+    def reset_detection_button(self):
+        """将开始/停止按钮恢复为未检测状态"""
+        self.is_detecting = False
+        self.start_stop_button.setText("开始检测")
+        self.start_stop_button.setIcon(
+            self.style().standardIcon(self.style().SP_MediaPlay)
+        )
+
+    def start_pipeline(self, source, is_file=False, offline=False, batch_size=1):
+        """启动采集-推理-渲染流水线"""
+        self.stop_pipeline()
+        self.source_is_file = is_file
+        config = load_initial_config()
+        scheduler = InferenceScheduler(
+            config["infer_every"], config["diff_threshold"]
+        )
+        self.pipeline = DetectionPipeline(
+            source,
+            self.bird_detector,
+            is_file,
+            offline=offline,
+            batch_size=batch_size,
+            scheduler=scheduler,
+            capture_size=self.current_profile()["capture_size"],
+            parent=self,
+        )
+        self.pipeline.set_detecting(self.is_detecting)
+        self.pipeline.set_target_size(*self.label_size(self.video_label))
+        self.update_display_enabled()
+        self.pipeline.frame_ready.connect(self.on_frame_ready)
+        self.pipeline.error.connect(self.on_pipeline_error)
+        self.pipeline.status.connect(self.statusBar.showMessage)
+        self.pipeline.finished.connect(self.on_pipeline_finished)
+        self.last_frame_time = QDateTime.currentDateTime()
+        self.pipeline.start()
+
+    def current_profile(self):
+        """配置文件中的性能配置参数"""
+        config = load_initial_config()
+        return get_profile(config["profile"], config["profile_overrides"])
+
+    def apply_profile(self):
+        """把性能配置应用到检测器和摄像头采集，不需要重启"""
+        profile = self.current_profile()
+        if self.bird_detector is not None:
+            self.bird_detector.apply_profile(profile)
+        if self.pipeline is not None:
+            self.pipeline.set_capture_size(profile["capture_size"])
+
+    def stop_pipeline(self):
+        """停止当前流水线"""
+        if self.pipeline is not None:
+            self.pipeline.frame_ready.disconnect(self.on_frame_ready)
+            self.pipeline.error.disconnect(self.on_pipeline_error)
+            self.pipeline.status.disconnect(self.statusBar.showMessage)
+            self.pipeline.finished.disconnect(self.on_pipeline_finished)
+            self.pipeline.stop()
+            self.pipeline = None
+        if self.grid_labels:
+            self.set_grid(0)
+        self.progress_bar.setVisible(False)
+
+    def start_camera(self):
+        """选择摄像头并启动流水线"""
+        if self.selected_camera is None:
+            if not self.show_camera_selection_dialog():
+                return False
+        self.start_pipeline(self.selected_camera)
+        return True
+
+    def on_pipeline_error(self, message):
+        """处理流水线错误"""
+        if self.pipeline is None or self.sender() is not self.pipeline:
+            return
+        if isinstance(self.pipeline, MultiCameraPipeline):
+            # 单路摄像头出错时其余摄像头继续监控
+            self.statusBar.showMessage(message)
+            return
+        is_file = self.source_is_file
+        self.stop_pipeline()
+        self.statusBar.showMessage(message)
+        self.reset_detection_button()
+        self.count_label.setText("识别到的鸟类数量: 0")
+        if not is_file:
+            # 显示摄像头未打开的占位符
+            self.show_frame(self.create_no_camera_image())
+
+    def on_pipeline_finished(self, frame_count, seconds):
+        """离线分析完成"""
+        if self.pipeline is None or self.sender() is not self.pipeline:
+            return
+        # 显示最后一帧的结果后再停止流水线
+        result = self.pipeline.take_latest()
+        if result is not None:
+            self.display_result(result)
+        self.stop_pipeline()
+        self.reset_detection_button()
+        speed = frame_count / seconds if seconds > 0 else 0
+        self.statusBar.showMessage(
+            f"离线分析完成: 共 {frame_count} 帧, {speed:.1f} 帧/秒"
+        )
+
+    def on_frame_ready(self):
+        """接收流水线渲染完成的帧并更新界面"""
+        if self.pipeline is None or self.sender() is not self.pipeline:
+            return
+        if isinstance(self.pipeline, MultiCameraPipeline):
+            self.display_streams(self.pipeline.take_all())
+            return
+        result = self.pipeline.take_latest()
+        if result is None:
+            return
+        if self.pipeline.offline:
+            self.progress_bar.setValue(self.pipeline.progress())
+        self.display_result(result)
+
+    def update_fps(self, results):
+        """计算平滑后的FPS和采集到显示的延迟，并显示摄像头丢帧数"""
         current_time = QDateTime.currentDateTime()
         elapsed = self.last_frame_time.msecsTo(current_time)
         if elapsed > 0:  # 避免除以零
             current_fps = 1000 / elapsed
             self.fps = (self.fps * 0.9) + (current_fps * 0.1)  # 平滑FPS显示
         self.last_frame_time = current_time
-
-        if not self.is_detecting:
-            # 如果停止检测，继续读取帧并显示，但不进行推理和统计
-            if self.cap is None:
-                if self.selected_camera is None:
-                    # 如果没有选中的摄像头，弹出选择对话框
-                    if not self.show_camera_selection_dialog():
-                        return
-                self.cap = cv2.VideoCapture(self.selected_camera)
-                # 设置摄像头分辨率为640x640
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 640)
-                # 设置摄像头缓冲区大小
-                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                if not self.cap.isOpened():
-                    # 显示摄像头未打开的占位符
-                    black_image = np.zeros((640, 640, 3), dtype=np.uint8)
-                    no_camera_icon_path = "resources/icons/no_camera.png"
-                    if os.path.exists(no_camera_icon_path):
-                        icon = cv2.imread(no_camera_icon_path, cv2.IMREAD_UNCHANGED)
-                        if icon is not None:
-                            # 调整图标大小并叠加到黑色背景
-                            icon_height, icon_width = icon.shape[:2]
-                            scale = min(400 / icon_width, 300 / icon_height)
-                            resized_icon = cv2.resize(
-                                icon,
-                                (int(icon_width * scale), int(icon_height * scale)),
-                            )
-                            h, w = black_image.shape[:2]
-                            ih, iw = resized_icon.shape[:2]
-                            x = (w - iw) // 2
-                            y = (h - ih) // 2
-                            if resized_icon.shape[2] == 4:
-                                alpha_s = resized_icon[:, :, 3] / 255.0
-                                alpha_l = 1.0 - alpha_s
-                                for c in range(0, 3):
-                                    black_image[y : y + ih, x : x + iw, c] = (
-                                        alpha_s * resized_icon[:, :, c]
-                                        + alpha_l
-                                        * black_image[y : y + ih, x : x + iw, c]
-                                    )
-                            else:
-                                black_image[y : y + ih, x : x + iw] = resized_icon[
-                                    :, :, :3
-                                ]
-                    processed_frame = black_image
-                    self.count_label.setText("识别到的鸟类数量: 0")
-                    self.fps_label.setText(f"FPS: {self.fps:.1f}")
-                    h, w, ch = processed_frame.shape
-                    bytes_per_line = ch * w
-                    qt_image = QImage(
-                        processed_frame.data, w, h, bytes_per_line, QImage.Format_RGB888
-                    ).rgbSwapped()
-                    pixmap = QPixmap.fromImage(qt_image)
-                    self.video_label.setPixmap(
-                        pixmap.scaled(
-                            self.video_label.width(),
-                            self.video_label.height(),
-                            Qt.KeepAspectRatio,
-                        )
-                    )
-                    return
-
-            ret, frame = self.cap.read()
-            if not ret:
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ret, frame = self.cap.read()
-                if not ret:
-                    self.statusBar.showMessage("视频播放完毕或无法读取帧")
-                    return
-
-            # 显示非检测状态下的画面
-            processed_frame = frame
+        now = time.monotonic()
+        for result in results:
+            latency = now - result["captured_at"]
+            stage_metrics.observe("end_to_end", latency)
+            self.display_latency = self.display_latency * 0.9 + latency * 0.1
+        text = f"FPS: {self.fps:.1f}  延迟: {self.display_latency * 1000:.0f} ms"
+        if self.pipeline is not None and not self.source_is_file:
+            text += f"  丢帧: {self.pipeline.dropped_frames()}"
+        self.fps_label.setText(text)
+
+    def display_result(self, result):
+        """根据流水线结果更新画面、计数和图表"""
+        # 计算实际FPS和采集到显示的延迟
+        self.update_fps([result])
+
+        # 更新视频显示 (窗口隐藏或最小化时渲染线程不转换画面)
+        if result["image"] is not None:
+            self.video_label.setPixmap(QPixmap.fromImage(result["image"]))
+        if self.pipeline is not None:
+            # QPixmap已复制画面，显示缓冲区可以交还渲染线程复用
+            self.pipeline.release(result)
+            self.pipeline.set_target_size(*self.label_size(self.video_label))
+
+        if not result["detected"]:
+            # 非检测状态下只显示画面
             self.count_label.setText("识别到的鸟类数量: 0")
-            self.fps_label.setText(f"FPS: {self.fps:.1f}")
-            h, w, ch = processed_frame.shape
-            bytes_per_line = ch * w
-            qt_image = QImage(
-                processed_frame.data, w, h, bytes_per_line, QImage.Format_RGB888
-            ).rgbSwapped()
-            pixmap = QPixmap.fromImage(qt_image)
-            self.video_label.setPixmap(
-                pixmap.scaled(
-                    self.video_label.width(),
-                    self.video_label.height(),
-                    Qt.KeepAspectRatio,
-                )
-            )
             return
 
-        if self.cap is None:
-            if self.selected_camera is None:
-                if not self.show_camera_selection_dialog():
-                    self.is_detecting = False
-                    self.start_stop_button.setText("开始检测")
-                    self.start_stop_button.setIcon(
-                        self.style().standardIcon(self.style().SP_MediaPlay)
-                    )
-                    return
-            self.cap = cv2.VideoCapture(self.selected_camera)
-            # 设置摄像头分辨率为640x640
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 640)
-            # 设置摄像头缓冲区大小
-            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            if not self.cap.isOpened():
-                self.statusBar.showMessage("摄像头无法打开或不可用")
-                self.is_detecting = False
-                self.start_stop_button.setText("开始检测")
-                self.start_stop_button.setIcon(
-                    self.style().standardIcon(self.style().SP_MediaPlay)
-                )
-                return
-
-        ret, frame = self.cap.read()
-        if not ret:
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, frame = self.cap.read()
-            if not ret:
-                self.statusBar.showMessage("视频播放完毕或无法读取帧")
-                self.is_detecting = False
-                self.start_stop_button.setText("开始检测")
-                self.start_stop_button.setIcon(
-                    self.style().standardIcon(self.style().SP_MediaPlay)
-                )
-                return
-
-        # 处理帧
-        processed_frame = self.bird_detector.process_frame(frame)
-
         # 更新计数标签
+        self.count_label.setText(f"识别到的鸟类数量: {result['total']}")
+        self.show_scheduler_status()
+
+        self.record_density(result["names"], result["counts"])
+
+    def display_streams(self, results):
+        """更新多路摄像头的画面和各路数量，密度图记录各路最新数量之和"""
+        self.update_fps(results.values())
+        for index, result in results.items():
+            if result["image"] is not None:
+                pixmap = QPixmap.fromImage(result["image"])
+                self.grid_labels[index].setPixmap(pixmap)
+            self.pipeline.release(result)
+            self.stream_totals[index] = result["total"] if result["detected"] else 0
+        self.pipeline.set_target_size(*self.label_size(self.grid_labels[0]))
+        per_stream = ", ".join(
+            f"摄像头 {source}: {total}"
+            for source, total in zip(self.pipeline.sources, self.stream_totals)
+        )
         self.count_label.setText(
-            f"识别到的鸟类数量: {self.bird_detector.total_objects}"
+            f"识别到的鸟类数量: {sum(self.stream_totals)} ({per_stream})"
         )
-
-        # 记录数量密度数据
-        now_str = datetime.now().strftime("%H:%M:%S")
-        current_frame_class_counts = {}
-        if hasattr(self.bird_detector, "current_detection_info"):
-            for det_info in self.bird_detector.current_detection_info:
-                class_name = det_info["class"]
-                if class_name in self.density_classes:
-                    current_frame_class_counts[class_name] = (
-                        current_frame_class_counts.get(class_name, 0) + 1
-                    )
-
-        total_objects_for_density = sum(current_frame_class_counts.values())
-
-        if total_objects_for_density > 0:
-            self.recognition_data.append(
-                (now_str, total_objects_for_density, current_frame_class_counts)
-            )
-            if len(self.recognition_data) > 100:
-                self.recognition_data.pop(0)
-
-        # 更新视频显示
-        h, w, ch = processed_frame.shape
-        bytes_per_line = ch * w
-        qt_image = QImage(
-            processed_frame.data, w, h, bytes_per_line, QImage.Format_RGB888
-        ).rgbSwapped()
-        pixmap = QPixmap.fromImage(qt_image)
-        self.video_label.setPixmap(
-            pixmap.scaled(
-                self.video_label.width(), self.video_label.height(), Qt.KeepAspectRatio
+        detected = [result for result in results.values() if result["detected"]]
+        if not detected:
+            return
+        streams = self.pipeline.stream_detectors()
+        if not streams:
+            return
+        counts = sum(stream.current_counts for stream in streams)
+        self.record_density(detected[0]["names"], counts)
+
+    def record_density(self, names, counts):
+        """记录一帧的数量密度数据并更新图表"""
+        # 记录数量密度数据 (密度图类别按名称排序的数量数组)
+        density_names, density_ids = self.density_columns(names)
+        density_counts = counts[density_ids]
+
+        # 更新图表 (实际绘制由图表的定时器限速完成)
+        self.canvas.set_classes(density_names)
+        self.canvas.add_sample(density_counts)
+
+    def density_columns(self, names):
+        """密度图类别名称 (排序后) 及其类别id，类别或模型变化时才重新计算"""
+        key = (id(names), frozenset(self.density_classes))
+        if key != self.density_key:
+            ids = {name: class_id for class_id, name in names.items()}
+            density_names = sorted(c for c in self.density_classes if c in ids)
+            self.density_key = key
+            self.density_cache = (
+                density_names,
+                np.array([ids[name] for name in density_names], dtype=np.intp),
             )
-        )
+        return self.density_cache
 
-        # 更新图表
-        self.update_density_chart()
-
-    def update_density_chart(self):
-        """更新密度图表"""
-        if not self.recognition_data or not getattr(self, "density_classes", None):
-            self.ax.clear()
-            self.ax.set_title("数量密度分布（暂无数据）")
-            self.canvas.draw()
+    def show_scheduler_status(self):
+        """在状态栏显示跳帧率、运动门控计数和节省的推理时间，每秒更新一次"""
+        if self.pipeline is None:
             return
-
-        # 统计每个类别的时间序列
-        from collections import defaultdict
-
-        class_time_count = defaultdict(list)
-        timestamps = [item[0] for item in self.recognition_data]
-        # 统计每个类别在每个时间点的数量
-        for idx, (t, _, frame_classes) in enumerate(self.recognition_data):
-            for cls in self.density_classes:
-                class_time_count[cls].append(frame_classes.get(cls, 0))
-
-        self.ax.clear()
-        # 兼容新版matplotlib的colormap获取方式
-        if hasattr(matplotlib, "colormaps"):
-            # 只为实际需要绘制的类别分配颜色
-            valid_classes = [
-                cls for cls in self.density_classes if any(class_time_count[cls])
-            ]
-            if not valid_classes:
-                self.ax.set_title("数量密度分布（暂无数据）")
-                self.canvas.draw()
-                return
-            color_map = matplotlib.colormaps.get_cmap("tab10").resampled(
-                max(1, len(valid_classes))
+        scheduler = self.pipeline.scheduler
+        motion_gate = getattr(self.bird_detector, "motion_gate", None)
+        if not scheduler.is_active() and motion_gate is None:
+            return
+        current_time = QDateTime.currentDateTime()
+        if self.last_status_update.msecsTo(current_time) < 1000:
+            return
+        self.last_status_update = current_time
+        parts = []
+        if scheduler.is_active():
+            parts.append(
+                f"跳帧率 {scheduler.skip_rate():.0%}, "
+                f"节省推理时间 {scheduler.saved_seconds():.1f} 秒"
             )
-            for i, cls in enumerate(valid_classes):
-                y = class_time_count[cls]
-                color = color_map(i)
-                self.ax.plot(
-                    timestamps,
-                    y,
-                    label=cls,
-                    linewidth=2.5,
-                    marker="o",
-                    markersize=7,
-                    color=color,
-                )
-        else:
-            import matplotlib.cm as cm
-
-            # 只为实际需要绘制的类别分配颜色
-            valid_classes = [
-                cls for cls in self.density_classes if any(class_time_count[cls])
-            ]
-            if not valid_classes:
-                self.ax.set_title("数量密度分布（暂无数据）")
-                self.canvas.draw()
-                return
-            color_map = cm.get_cmap("tab10", max(1, len(valid_classes)))
-            for i, cls in enumerate(valid_classes):
-                y = class_time_count[cls]
-                color = (
-                    color_map(i)
-                    if hasattr(color_map, "__call__")
-                    else color_map.colors[i]
-                )
-                self.ax.plot(
-                    timestamps,
-                    y,
-                    label=cls,
-                    linewidth=2.5,
-                    marker="o",
-                    markersize=7,
-                    color=color,
-                )
-
-        self.ax.set_xlabel("时间", fontsize=12)
-        self.ax.set_ylabel("数量", fontsize=12)
-        self.ax.set_title("数量密度分布", fontsize=14, fontweight="bold")
-        self.ax.grid(True, linestyle="--", alpha=0.4)
-        # x轴最多显示10个标签
-        step = max(1, len(timestamps) // 10)
-        self.ax.set_xticks(timestamps[::step])
-        self.ax.tick_params(axis="x", labelrotation=45)
-        self.ax.legend(
-            fontsize=12, loc="upper left", frameon=True, fancybox=True, shadow=True
-        )
-        self.canvas.draw()
+        if motion_gate is not None:
+            parts.append(
+                f"运动门控 跳过 {motion_gate.frames_gated} 帧, "
+                f"推理 {motion_gate.frames_inferred} 帧 "
+                f"(区域 {motion_gate.frames_roi} 帧)"
+            )
+        self.statusBar.showMessage("检测中... " + "; ".join(parts))
 
     def save_data_to_csv(self):
-        """保存检测数据到CSV文件"""
-        if (
-            not self.bird_detector
-            or not hasattr(self.bird_detector, "current_detection_info")
-            or not self.bird_detector.current_detection_info
-        ):
+        """把本次运行的逐帧检测结果导出为CSV文件"""
+        if not self.bird_detector or not self.bird_detector.result_files():
             self.statusBar.showMessage("没有检测数据可保存")
             return
 
@@ -906,17 +1218,9 @@ class YoloVisualizationApp(QMainWindow):
         )
         if file_path:
             try:
-                # 写入所有检测到的目标，不论是否勾选显示
-                # 写入表头
-                with open(file_path, "w", newline="", encoding="utf-8") as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(["时间戳", "类别", "总数量"])
-                    # 写入每一帧的所有检测信息
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    total_objects = len(self.bird_detector.current_detection_info)
-                    for info in self.bird_detector.current_detection_info:
-                        writer.writerow([timestamp, info["class"], total_objects])
-                self.statusBar.showMessage(f"数据已保存到 {file_path}")
+                # 只读取识别类别的数量列，逐帧一行
+                rows = self.bird_detector.export_results(file_path)
+                self.statusBar.showMessage(f"已保存 {rows} 帧数据到 {file_path}")
             except Exception as e:
                 self.statusBar.showMessage(f"保存文件失败: {e}")
 
@@ -931,15 +1235,29 @@ class YoloVisualizationApp(QMainWindow):
         )
 
         if reply == QMessageBox.Yes:
-            # 停止摄像头
-            if self.cap and self.cap.isOpened():
-                self.cap.release()
-            self.timer.stop()
+            # 停止流水线并释放摄像头，等待仍在等待网络流超时的采集线程退出
+            self.stop_pipeline()
+            if not wait_detached_stages():
+                print("网络流采集线程未能在超时时间内结束")
+            # 等待仍在加载的模型，关闭加载出但不再使用的检测器
+            if self.model_loader is not None:
+                self.discard_model_loader()
+            for loader in self.stale_loaders:
+                if not loader.wait(int(LOAD_WAIT_TIMEOUT * 1000)):
+                    print("模型加载线程未能在超时时间内结束")
+                loader.close_result()
+            # 正在扫描摄像头时等待扫描线程结束
+            if self.camera_scanner is not None and self.camera_scanner.isRunning():
+                if not self.camera_scanner.stop():
+                    print("摄像头扫描线程未能在超时时间内结束")
             cv2.destroyAllWindows()
+            if self.metrics_writer is not None:
+                self.metrics_writer.stop()
             # 生成趋势图（使用保存的CSV文件，如果存在）
             try:
-                # 调用ObjectDetector的plot_trends方法
+                # 先写完缓冲的结果，再调用ObjectDetector的plot_trends方法
                 if hasattr(self, "bird_detector") and self.bird_detector:
+                    self.bird_detector.close()
                     self.bird_detector.plot_trends()
             except Exception as e:
                 print(f"生成趋势图时出错: {e}")
@@ -947,32 +1265,117 @@ class YoloVisualizationApp(QMainWindow):
         else:
             event.ignore()
 
-    def load_model_and_classes(self, model_path):
-        """加载模型和类别"""
-        # 主动释放旧模型
-        if hasattr(self, "bird_detector") and self.bird_detector is not None:
-            del self.bird_detector
-            gc.collect()
-        try:
-            self.model_path = model_path
-            self.bird_detector = ObjectDetector(model_path)
-            self.all_classes = list(self.bird_detector.model.names.values())
-            # 初始时，识别类别和密度图类别都等于模型的全部类别
-            if not hasattr(self, "selected_classes") or not self.selected_classes:
-                self.selected_classes = set(self.all_classes)
-            if not hasattr(self, "density_classes") or not self.density_classes:
-                self.density_classes = set(self.all_classes)
-
-            self.bird_detector.selected_classes = self.selected_classes
-            self.bird_detector.density_classes = self.density_classes
-
-            self.statusBar.showMessage(f"成功加载模型: {os.path.basename(model_path)}")
-
-        except Exception as e:
-            self.statusBar.showMessage(f"加载模型失败: {e}")
-            # 如果加载失败，清空类别和模型路径
-            self.model_path = None
-            self.all_classes = []
-            self.selected_classes = set()
-            self.density_classes = set()
-            self.bird_detector = None  # 清空检测器对象
+    def detector_options(self):
+        """根据配置文件生成创建检测器时的结果保存和推理后端参数"""
+        config = load_initial_config()
+        return {
+            "results_format": config["results_format"],
+            "history_path": config["history_db"] or None,
+            "backend": config["backend"],
+            "threads": config["threads"],
+            "precision": config["precision"],
+        }
+
+    def load_model_async(self, model_path):
+        """在后台线程中加载模型，加载期间显示进度条"""
+        if self.model_loader is not None:
+            self.discard_model_loader()
+        self.statusBar.showMessage(f"正在加载模型: {os.path.basename(model_path)}")
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(True)
+        self.model_loader = ModelLoader(model_path, self.detector_options(), self)
+        self.model_loader.loaded.connect(self.on_model_loaded)
+        self.model_loader.failed.connect(self.on_model_failed)
+        self.model_loader.start()
+
+    def discard_model_loader(self):
+        """放弃尚未完成的加载任务，线程结束后关闭它加载出的检测器"""
+        loader = self.model_loader
+        self.model_loader = None
+        loader.loaded.disconnect(self.on_model_loaded)
+        loader.failed.disconnect(self.on_model_failed)
+        loader.finished.connect(loader.close_result)
+        if loader.isFinished():
+            # 连接前线程已结束时不会再收到finished信号
+            loader.close_result()
+        self.stale_loaders = [
+            stale for stale in self.stale_loaders if stale.isRunning()
+        ] + [loader]
+
+    def on_model_loaded(self, detector, model_path):
+        """后台模型加载完成"""
+        if self.sender() is not self.model_loader:
+            # 断开连接前已排队的旧加载任务的结果，由 discard_model_loader 关闭
+            return
+        # 检测器交给窗口管理，加载线程不再持有
+        self.model_loader.detector = None
+        self.model_loader = None
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setVisible(False)
+        self.set_detector(detector, model_path)
+
+    def on_model_failed(self, model_path, message):
+        """后台模型加载失败"""
+        if self.sender() is not self.model_loader:
+            return
+        self.model_loader = None
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setVisible(False)
+        self.clear_detector(message)
+
+    def set_detector(self, detector, model_path):
+        """使用新创建的检测器替换旧检测器，并同步类别设置"""
+        old_detector = self.bird_detector
+        self.model_path = model_path
+        self.bird_detector = detector
+        config = load_initial_config()
+        if config["motion_gate"]:
+            self.bird_detector.motion_gate = MotionGate(
+                config["motion_threshold"], config["motion_min_area"]
+            )
+        self.all_classes = list(self.bird_detector.model.names.values())
+        # 初始时，识别类别和密度图类别都等于模型的全部类别
+        if not hasattr(self, "selected_classes") or not self.selected_classes:
+            self.selected_classes = set(self.all_classes)
+        if not hasattr(self, "density_classes") or not self.density_classes:
+            self.density_classes = set(self.all_classes)
+
+        self.bird_detector.selected_classes = self.selected_classes
+        self.bird_detector.density_classes = self.density_classes
+        self.bird_detector.apply_profile(self.current_profile())
+        if self.pipeline is not None:
+            self.pipeline.set_detector(self.bird_detector)
+        # 推理线程换用新检测器之后，再写完并关闭旧检测器的结果文件
+        if old_detector is not None:
+            old_detector.close()
+        self.load_density_history()
+
+        self.statusBar.showMessage(f"成功加载模型: {os.path.basename(model_path)}")
+
+    def load_density_history(self):
+        """从检测历史中恢复密度图时间窗口内的数据 (如更换模型之前的数据)"""
+        if self.bird_detector is None or self.bird_detector.history is None:
+            return
+        rows = self.bird_detector.history.query_frames(
+            start=time.time() - self.canvas.window_seconds,
+            classes=self.density_classes,
+        )
+        self.canvas.set_classes(self.density_classes)
+        self.canvas.clear()
+        for timestamp, _, counts in rows:
+            self.canvas.add_sample(counts, timestamp)
+
+    def clear_detector(self, message):
+        """模型加载失败时清空检测器和类别"""
+        self.statusBar.showMessage(f"加载模型失败: {message}")
+        # 如果加载失败，清空类别和模型路径
+        self.model_path = None
+        self.all_classes = []
+        self.selected_classes = set()
+        self.density_classes = set()
+        old_detector = self.bird_detector
+        self.bird_detector = None  # 清空检测器对象
+        if self.pipeline is not None:
+            self.pipeline.set_detector(None)
+        if old_detector is not None:
+            old_detector.close()
@@ -0,0 +1,275 @@
+"""
+推理后端模块 - 统一PyTorch (ultralytics)、ONNX Runtime和OpenVINO的推理接口
+Creater Tz2H
+
+每个后端提供 names ({类别id: 类别名称})、model_path (实际加载的模型文件) 和
+predict(frames, classes=None, **options)，对每帧返回检测数组
+[x1, y1, x2, y2, conf, cls]。ONNX Runtime和OpenVINO后端只依赖
+OpenCV和NumPy完成预处理和NMS，运行时不需要导入torch。
+"""
+
+import ast
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from bird_detector_app.export import BACKEND_FORMATS, exported_path
+from bird_detector_app.metrics import stage_metrics
+
+BACKENDS = ("ultralytics", "onnxruntime", "openvino")
+PRECISIONS = ("fp32", "int8")
+# 与ultralytics一致的默认推理参数
+DEFAULT_IMGSZ = 640
+DEFAULT_CONF = 0.25
+DEFAULT_IOU = 0.7
+DEFAULT_MAX_DET = 300
+# 按类别做NMS时各类别检测框的坐标偏移量
+MAX_WH = 7680
+# letterbox填充颜色
+PAD_COLOR = (114, 114, 114)
+
+
+def letterbox(frame, size):
+    """等比例缩放并填充为 size x size，返回 (图像, 缩放比例, (左, 上) 填充)"""
+    h, w = frame.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = round(w * ratio), round(h * ratio)
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    left = (size - new_w) // 2
+    top = (size - new_h) // 2
+    image = cv2.copyMakeBorder(
+        frame,
+        top,
+        size - new_h - top,
+        left,
+        size - new_w - left,
+        cv2.BORDER_CONSTANT,
+        value=PAD_COLOR,
+    )
+    return image, ratio, (left, top)
+
+
+def record_speed(results):
+    """记录ultralytics给出的预处理、推理、后处理(NMS)耗时"""
+    for result in results:
+        for stage, milliseconds in result.speed.items():
+            if milliseconds is not None:
+                stage_metrics.observe(stage, milliseconds / 1000)
+
+
+class UltralyticsBackend:
+    """使用ultralytics加载 .pt 等格式的模型"""
+
+    def __init__(self, model_path, threads=0):
+        """加载模型，threads大于0时限制torch的线程数"""
+        from ultralytics import YOLO
+
+        if threads > 0:
+            import torch
+
+            torch.set_num_threads(threads)
+        self.model_path = model_path
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+
+    def predict(self, frames, classes=None, **options):
+        """对多帧执行一次推理"""
+        results = self.model.predict(frames, classes=classes, **options)
+        record_speed(results)
+        return [result.boxes.data.cpu().numpy() for result in results]
+
+
+class ExportedBackend:
+    """导出模型的公共部分：letterbox预处理、推理计时和NMS后处理
+
+    子类设置 names、imgsz、fixed_batch (输入批大小固定为1时为True)、
+    fixed_size (输入尺寸固定时为该尺寸，否则为None) 并实现 run(blob)。
+    """
+
+    def predict(
+        self,
+        frames,
+        classes=None,
+        imgsz=None,
+        conf=DEFAULT_CONF,
+        iou=DEFAULT_IOU,
+        max_det=DEFAULT_MAX_DET,
+        half=False,
+    ):
+        """对多帧执行推理，half在CPU上无效，忽略"""
+        if not frames:
+            return []
+        size = self.fixed_size or imgsz or self.imgsz
+        start = time.perf_counter()
+        letterboxed = [letterbox(frame, size) for frame in frames]
+        blob = cv2.dnn.blobFromImages(
+            [image for image, _, _ in letterboxed], 1 / 255.0, swapRB=True
+        )
+        preprocess_done = time.perf_counter()
+        if self.fixed_batch:
+            output = np.concatenate(
+                [self.run(blob[i : i + 1]) for i in range(len(blob))]
+            )
+        else:
+            output = self.run(blob)
+        inference_done = time.perf_counter()
+        class_mask = None
+        if classes is not None:
+            class_mask = np.zeros(len(self.names), dtype=bool)
+            class_mask[list(classes)] = True
+        detections_list = [
+            self.postprocess(
+                pred, ratio, pad, frame.shape[:2], class_mask, conf, iou, max_det
+            )
+            for pred, frame, (_, ratio, pad) in zip(output, frames, letterboxed)
+        ]
+        postprocess_done = time.perf_counter()
+        count = len(frames)
+        for stage, seconds in (
+            ("preprocess", preprocess_done - start),
+            ("inference", inference_done - preprocess_done),
+            ("postprocess", postprocess_done - inference_done),
+        ):
+            for _ in range(count):
+                stage_metrics.observe(stage, seconds / count)
+        return detections_list
+
+    def postprocess(self, pred, ratio, pad, shape, class_mask, conf, iou, max_det):
+        """解码一帧的输出 (4+类别数, 候选框数)，按类别做NMS并映射回原图坐标"""
+        pred = pred.T
+        scores = pred[:, 4:]
+        best = scores.max(axis=1)
+        keep = best > conf
+        pred, scores, best = pred[keep], scores[keep], best[keep]
+        cls = scores.argmax(axis=1)
+        if class_mask is not None:
+            keep = class_mask[cls]
+            pred, best, cls = pred[keep], best[keep], cls[keep]
+        if not len(pred):
+            return np.zeros((0, 6), dtype=np.float32)
+        # 中心点坐标转换为左上角坐标，按类别偏移后做NMS，不同类别互不抑制
+        top_left = pred[:, :2] - pred[:, 2:4] / 2
+        offset = cls[:, None] * MAX_WH
+        boxes = np.concatenate([top_left + offset, pred[:, 2:4]], axis=1)
+        indices = cv2.dnn.NMSBoxes(boxes.tolist(), best.tolist(), conf, iou)
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1)[:max_det]
+        xyxy = np.concatenate(
+            [top_left[indices], top_left[indices] + pred[indices, 2:4]], axis=1
+        )
+        h, w = shape
+        left, top = pad
+        xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - left) / ratio).clip(0, w)
+        xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - top) / ratio).clip(0, h)
+        return np.column_stack([xyxy, best[indices], cls[indices]]).astype(np.float32)
+
+    def set_input_shape(self, shape):
+        """根据模型输入形状 (N, C, H, W) 判断批大小和尺寸是否固定"""
+        batch, _, height, width = shape
+        self.fixed_batch = batch == 1
+        self.fixed_size = height if isinstance(height, int) and height > 0 else None
+
+
+class OnnxRuntimeBackend(ExportedBackend):
+    """使用ONNX Runtime在CPU上推理导出的 .onnx 模型"""
+
+    def __init__(self, model_path, threads=0):
+        """加载模型，threads大于0时限制算子内并行线程数"""
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.model_path = model_path
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        # ultralytics导出时把类别名称和输入尺寸写入模型元数据
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"])
+        imgsz = ast.literal_eval(metadata.get("imgsz", "None")) or [DEFAULT_IMGSZ]
+        self.imgsz = imgsz[0]
+        self.input_name = self.session.get_inputs()[0].name
+        self.set_input_shape(self.session.get_inputs()[0].shape)
+
+    def run(self, blob):
+        """执行推理，返回第一个输出"""
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(ExportedBackend):
+    """使用OpenVINO在CPU上推理导出的IR模型 (*_openvino_model 目录或 .xml)"""
+
+    def __init__(self, model_path, threads=0):
+        """加载模型，threads大于0时限制推理线程数"""
+        import openvino as ov
+        import yaml
+
+        if os.path.isdir(model_path):
+            model_dir = model_path
+            model_path = glob.glob(os.path.join(model_dir, "*.xml"))[0]
+        else:
+            model_dir = os.path.dirname(model_path)
+        self.model_path = model_path
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads > 0:
+            config["INFERENCE_NUM_THREADS"] = threads
+        core = ov.Core()
+        model = core.read_model(model_path)
+        self.compiled = core.compile_model(model, "CPU", config)
+        self.output = self.compiled.output(0)
+        # ultralytics导出时把类别名称和输入尺寸写入 metadata.yaml
+        with open(os.path.join(model_dir, "metadata.yaml"), encoding="utf-8") as f:
+            metadata = yaml.safe_load(f)
+        self.names = metadata["names"]
+        self.imgsz = metadata.get("imgsz", [DEFAULT_IMGSZ])[0]
+        shape = model.inputs[0].get_partial_shape()
+        self.set_input_shape(
+            [dim.get_length() if dim.is_static else None for dim in shape]
+        )
+
+    def run(self, blob):
+        """执行推理，返回第一个输出"""
+        return self.compiled([blob])[self.output]
+
+
+def create_backend(model_path, backend="ultralytics", threads=0, precision="fp32"):
+    """根据模型文件和后端名称创建推理后端
+
+    backend为onnxruntime或openvino且模型为 .pt 时，使用缓存在模型旁的
+    导出结果：precision为fp32时由 python -m bird_detector_app.export 导出，
+    尚未导出时提示并退回PyTorch模型；为int8时由
+    python -m bird_detector_app.quantize 量化，尚未量化或后端不支持INT8时
+    抛出异常，不会退回FP32模型。
+    """
+    int8 = precision == "int8"
+    if int8 and model_path.endswith(".pt") and backend not in BACKEND_FORMATS:
+        raise ValueError("INT8模型需要使用onnxruntime或openvino后端")
+    if backend in BACKEND_FORMATS and model_path.endswith(".pt"):
+        export_format = BACKEND_FORMATS[backend]
+        target = exported_path(model_path, export_format, int8)
+        if os.path.exists(target):
+            model_path = target
+        elif int8:
+            raise FileNotFoundError(
+                f"未找到INT8模型 {target}，请先运行 python -m "
+                f"bird_detector_app.quantize --format {export_format} --calib ..."
+            )
+        else:
+            print(
+                f"未找到导出的模型 {target}，请先运行 "
+                f"python -m bird_detector_app.export --format "
+                f"{export_format}，暂时使用PyTorch模型"
+            )
+    if model_path.endswith(".onnx"):
+        return OnnxRuntimeBackend(model_path, threads)
+    if model_path.endswith(".xml") or model_path.rstrip("/\\").endswith(
+        "_openvino_model"
+    ):
+        return OpenVinoBackend(model_path.rstrip("/\\"), threads)
+    return UltralyticsBackend(model_path, threads)
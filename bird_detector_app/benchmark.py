@@ -0,0 +1,323 @@
+"""
+性能基准测试模块 - 分阶段测量检测流程的延迟、吞吐量和内存占用
+Creater Tz2H
+
+用法示例:
+    python -m bird_detector_app.benchmark --frames 200 -o bench.json
+    python -m bird_detector_app.benchmark --video clip.mp4 --skip-qt -o -
+
+可在无显示器、仅有CPU的Linux机器上运行，结果以JSON输出，便于比较不同版本。
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+from utils.config_manager import PROFILES, get_profile, load_initial_config
+
+from bird_detector_app.backends import BACKENDS, PRECISIONS
+from bird_detector_app.detector import ObjectDetector
+
+# 合成检测框所属类别，未指定时使用COCO中的bird
+DEFAULT_BENCH_CLASS = "bird"
+
+
+def percentile_summary(latencies):
+    """根据延迟列表（秒）计算统计结果（毫秒）"""
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies) * 1000
+    total = float(values.sum())
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p90_ms": round(float(np.percentile(values, 90)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+        "throughput_fps": round(len(values) * 1000 / total, 2) if total > 0 else None,
+    }
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存 (MB)"""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS单位为字节
+        return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+    except ImportError:
+        import psutil
+
+        return round(psutil.Process().memory_info().peak_wset / 1024 / 1024, 1)
+
+
+def time_stage(func, items, warmup):
+    """对每个输入执行func并计时，返回每次的耗时（秒）"""
+    for item in items[:warmup]:
+        func(item)
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def synthetic_frames(count, width, height, seed):
+    """生成可复现的合成帧（平滑噪声，压缩特性接近自然图像）"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        noise = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        frames.append(cv2.GaussianBlur(noise, (0, 0), 5))
+    return frames
+
+
+def synthetic_detections(count, boxes, width, height, class_ids, seed):
+    """生成可复现的合成检测结果 [x1, y1, x2, y2, conf, cls]"""
+    rng = np.random.default_rng(seed)
+    results = []
+    for _ in range(count):
+        x1 = rng.uniform(0, width * 0.9, boxes)
+        y1 = rng.uniform(0, height * 0.9, boxes)
+        x2 = np.minimum(x1 + rng.uniform(10, width * 0.1, boxes), width - 1)
+        y2 = np.minimum(y1 + rng.uniform(10, height * 0.1, boxes), height - 1)
+        conf = rng.uniform(0.25, 1.0, boxes)
+        cls = rng.choice(class_ids, boxes)
+        results.append(np.stack([x1, y1, x2, y2, conf, cls], axis=1).astype(np.float32))
+    return results
+
+
+def read_video_frames(path, count):
+    """读取视频前count帧，同时返回每帧的解码耗时"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频文件: {path}")
+    frames = []
+    latencies = []
+    try:
+        while len(frames) < count:
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            elapsed = time.perf_counter() - start
+            if not ret:
+                break
+            frames.append(frame)
+            latencies.append(elapsed)
+    finally:
+        cap.release()
+    return frames, latencies
+
+
+def bench_decode(frames, warmup):
+    """合成帧的解码阶段：测量JPEG解码耗时"""
+    encoded = [cv2.imencode(".jpg", frame)[1] for frame in frames]
+    return time_stage(lambda buf: cv2.imdecode(buf, cv2.IMREAD_COLOR), encoded, warmup)
+
+
+def bench_qt(frames, warmup, results):
+    """BGR帧转QImage以及实时密度图刷新，需要PyQt5
+
+    QImage转换直接调用渲染阶段的 RenderStage.convert (缩放到显示尺寸并写入
+    复用的缓冲区) 和 release，与应用中的显示路径一致。
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+
+    from bird_detector_app.pipeline import RenderStage
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    render_stage = RenderStage(None)
+    render_stage.target_size = (640, 640)
+
+    def to_qimage(frame):
+        result = {}
+        render_stage.convert(frame, result)
+        render_stage.release(result)
+
+    results["qimage_convert"] = time_stage(to_qimage, frames, warmup)
+
+    from ui.charts import LiveDensityChart
+
+    chart = LiveDensityChart()
+    chart.resize(480, 360)
+    chart.show()
+    chart.timer.stop()
+    chart.set_classes([DEFAULT_BENCH_CLASS, "person"])
+    app.processEvents()
+
+    def chart_update(index):
+        chart.add_sample({DEFAULT_BENCH_CLASS: index % 7, "person": index % 3})
+        chart.refresh()
+
+    results["chart_update"] = time_stage(chart_update, list(range(len(frames))), warmup)
+    chart.close()
+
+
+def run_benchmark(args):
+    """执行全部阶段并返回报告"""
+    results = {}
+    if args.video:
+        frames, results["decode"] = read_video_frames(args.video, args.frames)
+        if not frames:
+            raise RuntimeError("视频中没有可读取的帧")
+    else:
+        frames = synthetic_frames(args.frames, args.width, args.height, args.seed)
+        results["decode"] = bench_decode(frames, args.warmup)
+    height, width = frames[0].shape[:2]
+
+    detector = ObjectDetector(
+        args.model,
+        save_results=False,
+        backend=args.backend,
+        threads=args.threads,
+        precision=args.precision,
+    )
+    detector.apply_profile(get_profile(args.profile, args.profile_overrides))
+    names = detector.model.names
+    detector.selected_classes = set(names.values())
+    class_ids = [i for i, name in names.items() if name == DEFAULT_BENCH_CLASS] or [0]
+
+    results["process_frame"] = time_stage(
+        lambda frame: detector.process_frame(frame.copy()), frames, args.warmup
+    )
+
+    detections = synthetic_detections(
+        len(frames), args.boxes, width, height, class_ids, args.seed
+    )
+    pairs = [(frame.copy(), dets) for frame, dets in zip(frames, detections)]
+    results["draw_detection"] = time_stage(
+        lambda pair: detector.draw_detection(pair[0], pair[1]), pairs, args.warmup
+    )
+
+    counts = [len(dets) for dets in detections]
+    overlay_inputs = [(frame.copy(), count) for frame, count in zip(frames, counts)]
+
+    results["overlay_bars"] = time_stage(
+        lambda item: detector.draw_hud(*item), overlay_inputs, args.warmup
+    )
+
+    skipped = []
+    if args.skip_qt:
+        skipped.append("qt")
+    else:
+        try:
+            bench_qt(frames, args.warmup, results)
+        except ImportError as e:
+            skipped.append(f"qt ({e})")
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+        },
+        "config": {
+            "model": args.model,
+            "profile": args.profile,
+            "backend": type(detector.model).__name__,
+            "threads": args.threads,
+            "precision": args.precision,
+            "source": args.video or "synthetic",
+            "frames": len(frames),
+            "frame_size": [width, height],
+            "boxes": args.boxes,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "stages": {name: percentile_summary(lat) for name, lat in results.items()},
+        "skipped": skipped,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    config = load_initial_config()
+    parser = argparse.ArgumentParser(
+        prog="python -m bird_detector_app.benchmark",
+        description="分阶段测量检测流程的延迟、吞吐量和峰值内存，结果输出为JSON",
+    )
+    parser.add_argument("--video", help="使用录制的视频，默认使用合成帧")
+    parser.add_argument(
+        "-m", "--model", default=config["model_path"], help="YOLO模型路径"
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=config["profile"],
+        help="性能配置：推理输入尺寸、置信度/IoU阈值和最大检测数",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=config["backend"],
+        help="推理后端，onnxruntime和openvino需先运行 bird_detector_app.export",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=config["threads"],
+        help="推理线程数，0表示由后端决定",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default=config["precision"],
+        help="模型精度，int8需先运行 bird_detector_app.quantize",
+    )
+    parser.add_argument("-n", "--frames", type=int, default=100, help="测试帧数")
+    parser.add_argument("--warmup", type=int, default=5, help="每个阶段的预热次数")
+    parser.add_argument("--width", type=int, default=1280, help="合成帧宽度")
+    parser.add_argument("--height", type=int, default=720, help="合成帧高度")
+    parser.add_argument(
+        "--boxes", type=int, default=50, help="绘制阶段每帧的合成检测框数量"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument(
+        "--skip-qt", action="store_true", help="跳过QImage转换和图表刷新阶段"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="JSON输出文件，默认 results/benchmark_<时间>.json，'-' 表示标准输出",
+    )
+    args = parser.parse_args(argv)
+    args.profile_overrides = config["profile_overrides"]
+    if args.output is None:
+        args.output = os.path.join(
+            "results", f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+    return args
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = parse_args(argv)
+    report = run_benchmark(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(text)
+        return 0
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
+    print(f"基准测试结果已保存到: {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+摄像头检测模块 - 在后台线程中枚举可用摄像头
+Creater Tz2H
+"""
+
+import cv2
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# 检查的摄像头索引数量
+MAX_CAMERA_INDEX = 10
+# 程序退出时等待扫描线程结束的最长时间（秒），打开一个不存在的索引可能耗时数秒
+SCAN_STOP_TIMEOUT = 5.0
+
+
+def detect_cameras(max_index=MAX_CAMERA_INDEX, should_stop=None):
+    """检测系统中可用的摄像头，should_stop返回True时提前结束"""
+    available_cameras = []
+    for i in range(max_index):  # 检查前max_index个摄像头索引
+        if should_stop is not None and should_stop():
+            break
+        cap = cv2.VideoCapture(i)
+        if cap.isOpened():
+            ret, _ = cap.read()
+            if ret:
+                available_cameras.append(i)
+            cap.release()
+    return available_cameras
+
+
+class CameraScanner(QThread):
+    """摄像头扫描线程，逐个打开摄像头可能耗时数秒，不能在界面线程中执行"""
+
+    cameras_found = pyqtSignal(list)
+
+    def run(self):
+        """扫描摄像头并发送结果，被中断时不发送"""
+        cameras = detect_cameras(should_stop=self.isInterruptionRequested)
+        if not self.isInterruptionRequested():
+            self.cameras_found.emit(cameras)
+
+    def stop(self, timeout=SCAN_STOP_TIMEOUT):
+        """请求在检查下一个索引前结束扫描，最多等待timeout秒，返回是否已结束"""
+        self.requestInterruption()
+        return self.wait(int(timeout * 1000))
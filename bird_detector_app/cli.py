@@ -0,0 +1,248 @@
+"""
+命令行批处理模块 - 无界面运行目标检测并输出逐帧计数
+Creater Tz2H
+
+用法示例:
+    python -m bird_detector_app.cli videos/*.mp4 frames_dir -o counts.csv --jobs 4
+
+本模块及其导入的模块均不依赖PyQt5和matplotlib，适合在无显示器的服务器上运行。
+--jobs 大于1时使用进程池，每个工作进程只加载一次模型（见 runner 模块）。
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from datetime import datetime
+
+from utils.config_manager import PROFILES, get_profile, load_initial_config
+
+from bird_detector_app.backends import BACKENDS, PRECISIONS
+from bird_detector_app.runner import (
+    IMAGE_EXTENSIONS,
+    VIDEO_EXTENSIONS,
+    create_detector,
+    detect_frames,
+    iter_frames,
+    run_parallel,
+)
+
+BASE_FIELDS = ["来源", "帧号", "时间", "总数量"]
+
+
+def expand_inputs(patterns):
+    """将命令行输入（视频文件、图片目录、通配符）展开为待处理的来源列表"""
+    sources = []
+    for pattern in patterns:
+        if any(ch in pattern for ch in "*?["):
+            matches = sorted(glob.glob(pattern))
+        else:
+            matches = [pattern]
+        for path in matches:
+            if os.path.isdir(path) or path.lower().endswith(
+                VIDEO_EXTENSIONS + IMAGE_EXTENSIONS
+            ):
+                sources.append(path)
+            else:
+                print(f"跳过不支持的输入: {path}", file=sys.stderr)
+    return sources
+
+
+class CountWriter:
+    """逐帧计数输出，支持CSV和JSONL格式"""
+
+    def __init__(self, path, fmt, class_names):
+        """初始化输出文件"""
+        self.fmt = fmt
+        self.class_names = sorted(class_names)
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        if fmt == "csv":
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(BASE_FIELDS + self.class_names)
+
+    def write(self, record):
+        """写入一条记录"""
+        if self.fmt == "csv":
+            counts = record["类别数量"]
+            self.writer.writerow(
+                [record[field] for field in BASE_FIELDS]
+                + [counts.get(name, 0) for name in self.class_names]
+            )
+        else:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        """关闭输出文件"""
+        self.file.close()
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    config = load_initial_config()
+    parser = argparse.ArgumentParser(
+        prog="python -m bird_detector_app.cli",
+        description="无界面批量检测视频或图片，输出逐帧计数",
+    )
+    parser.add_argument("inputs", nargs="+", help="视频文件、图片目录或通配符")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="输出文件路径，默认 results/object_counts_<时间>.csv",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=["csv", "jsonl"],
+        help="输出格式，默认根据输出文件扩展名判断",
+    )
+    parser.add_argument(
+        "-m", "--model", default=config["model_path"], help="YOLO模型路径"
+    )
+    parser.add_argument(
+        "-c",
+        "--classes",
+        default=",".join(sorted(config["selected_classes"])),
+        help="需要统计的类别，逗号分隔，为空时统计全部类别",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=config["batch_size"],
+        help="每次推理的帧数",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="并行处理的进程数"
+    )
+    # 默认值来自config.txt，两个选项都可覆盖 (argparse.BooleanOptionalAction
+    # 需要Python 3.9)
+    parser.add_argument(
+        "--motion-gate",
+        action="store_true",
+        help="启用运动门控，画面无变化时跳过推理，有变化时只检测运动区域",
+    )
+    parser.add_argument(
+        "--no-motion-gate",
+        dest="motion_gate",
+        action="store_false",
+        help="关闭运动门控 (覆盖config.txt中的motion_gate)",
+    )
+    parser.set_defaults(motion_gate=config["motion_gate"])
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=config["profile"],
+        help="性能配置：推理输入尺寸、置信度/IoU阈值和最大检测数",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=config["backend"],
+        help="推理后端，onnxruntime和openvino需先运行 bird_detector_app.export",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=config["threads"],
+        help="单进程时的推理线程数，0表示由后端决定；并行时按进程数平分CPU",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default=config["precision"],
+        help="模型精度，int8需先运行 bird_detector_app.quantize",
+    )
+    parser.add_argument(
+        "--chunk-frames",
+        type=int,
+        default=0,
+        help="并行时每个任务的帧数，长视频会被切分为多个区间；0表示自动",
+    )
+    args = parser.parse_args(argv)
+    if args.output is None:
+        args.output = os.path.join(
+            "results",
+            f"object_counts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        )
+    if args.format is None:
+        args.format = "jsonl" if args.output.lower().endswith(".jsonl") else "csv"
+    args.motion_gate = (
+        (config["motion_threshold"], config["motion_min_area"])
+        if args.motion_gate
+        else None
+    )
+    args.profile = get_profile(args.profile, config["profile_overrides"])
+    args.batch_size = max(1, args.batch_size)
+    args.jobs = max(1, args.jobs)
+    return args
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = parse_args(argv)
+    sources = expand_inputs(args.inputs)
+    if not sources:
+        print("没有可处理的输入", file=sys.stderr)
+        return 1
+    selected_classes = {c for c in args.classes.split(",") if c}
+    detector = None
+    if args.jobs == 1 or not selected_classes:
+        # 未指定类别时需要加载模型以获取全部类别名称
+        detector = create_detector(
+            args.model,
+            selected_classes,
+            args.motion_gate,
+            args.profile,
+            args.backend,
+            args.threads if args.jobs == 1 else 0,
+            args.precision,
+        )
+        selected_classes = detector.selected_classes
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    writer = CountWriter(args.output, args.format, selected_classes)
+    try:
+        if args.jobs == 1:
+            for source in sources:
+                if detector.motion_gate is not None:
+                    detector.motion_gate.reset()
+                frame_count = 0
+                for record in detect_frames(
+                    detector, iter_frames(source), args.batch_size
+                ):
+                    writer.write(record)
+                    frame_count += 1
+                print(f"已处理 {source}: {frame_count} 帧", file=sys.stderr)
+        else:
+            # 主进程的检测器只用于确定类别，释放后再启动工作进程
+            detector = None
+            for source, records in run_parallel(
+                sources,
+                args.model,
+                selected_classes,
+                args.batch_size,
+                args.jobs,
+                args.chunk_frames,
+                args.motion_gate,
+                args.profile,
+                args.backend,
+                args.precision,
+            ):
+                for record in records:
+                    writer.write(record)
+                if records:
+                    print(
+                        f"已处理 {source}: 帧 {records[0]['帧号']}-{records[-1]['帧号']}",
+                        file=sys.stderr,
+                    )
+    finally:
+        writer.close()
+    print(f"结果已保存到: {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,91 +3,256 @@
 Creater Tz2H
 """
 
+import copy
 import csv
 import glob
 import os
+import time
 from datetime import datetime
 
 import cv2
-import matplotlib.pyplot as plt
-import pandas as pd
-from ultralytics import YOLO
+import numpy as np
+from utils.timeseries import CountSeries
+
+from bird_detector_app.backends import create_backend
+from bird_detector_app.history import DetectionHistory
+from bird_detector_app.overlay import HudOverlay
+from bird_detector_app.results_writer import (
+    SINK_CLASSES,
+    ResultsWriter,
+    format_timestamp,
+    get_sink_class,
+    read_results,
+)
+
+# 统计面板计算平均数量时使用的帧数
+STATS_WINDOW = 100
+# 性能配置中传给模型推理的参数
+PREDICT_KEYS = ("imgsz", "conf", "iou", "max_det", "half")
+
+
+def set_chinese_font(plt):
+    """设置matplotlib中文字体"""
+    plt.rcParams["font.sans-serif"] = ["SimHei"]
+    plt.rcParams["axes.unicode_minus"] = False
 
 
 class ObjectDetector:
-    """YOLO目标检测器类"""
+    """YOLO目标检测器类
+
+    本模块不在导入时加载matplotlib和pandas，仅在绘制趋势图时按需导入，
+    以便无界面的命令行批处理使用。
+    """
 
-    def __init__(self, model_path="resources/models/yolo11m.pt"):
-        """初始化检测器"""
-        plt.rcParams["font.sans-serif"] = ["SimHei"]
-        plt.rcParams["axes.unicode_minus"] = False
-        self.model = YOLO(model_path)
+    def __init__(
+        self,
+        model_path="resources/models/yolo11m.pt",
+        save_results=True,
+        results_format="csv",
+        history_path=None,
+        backend="ultralytics",
+        threads=0,
+        precision="fp32",
+    ):
+        """初始化检测器
+
+        save_results为False时不在results目录下写入逐帧结果；
+        results_format为结果文件格式 ("csv" 或 "parquet")；
+        history_path为检测历史数据库路径，为None时不记录检测历史；
+        backend为推理后端 ("ultralytics"、"onnxruntime" 或 "openvino")，
+        threads大于0时限制推理线程数；precision为int8时加载量化模型。
+        """
+        self.model = create_backend(model_path, backend, threads, precision)
         self.colors = {
             "box": (0, 255, 0),
             "text_bg": (44, 44, 44),
             "text": (255, 255, 255),
         }
         self.results_dir = "results"
-        if not os.path.exists(self.results_dir):
-            os.makedirs(self.results_dir)
-        self.csv_file = os.path.join(
-            self.results_dir,
-            f"object_detection_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        )
-        self.init_csv()
+        self.results_writer = None
+        self.history = None
+        self.session_start = time.time()
+        if save_results:
+            if history_path:
+                self.history = DetectionHistory(history_path)
+            self.results_writer = ResultsWriter(
+                self.results_dir,
+                sink_class=get_sink_class(results_format),
+                history=self.history,
+            )
         self.total_objects = 0
         self.class_counts = {}
+        # 当前帧各类别数量，按类别id索引 (只统计识别类别)
+        self.current_counts = np.zeros(len(self.model.names), dtype=np.int64)
         self.selected_classes = set()
         self.density_classes = set()
         # 计数相关属性
         self.threshold = 20  # 可根据需要调整
-        self.max_count = 0
-        self.count_history = []
-
-    def init_csv(self):
-        """初始化CSV文件"""
-        with open(self.csv_file, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["时间戳", "类别", "总数量"])
-
-    def save_to_csv(self, detection_info):
-        """保存检测结果到CSV"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        total_objects = len(detection_info)
-        with open(self.csv_file, "a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            for info in detection_info:
-                if info["class"] in self.selected_classes:
-                    writer.writerow([timestamp, info["class"], total_objects])
-        self.total_objects = total_objects
-        self.class_counts = {}
-        for info in detection_info:
-            obj_class = info["class"]
-            if obj_class not in self.class_counts:
-                self.class_counts[obj_class] = 0
-            self.class_counts[obj_class] += 1
-
-    def plot_trends(self):
-        """绘制并保存检测趋势图"""
-        csv_files = glob.glob(os.path.join(self.results_dir, "object_detection_*.csv"))
-        if not csv_files:
-            print("未找到检测结果文件！")
-            return
-        latest_csv = max(csv_files, key=os.path.getctime)
-        print(f"正在处理文件: {latest_csv}")
-        df = pd.read_csv(latest_csv)
-        df["时间戳"] = pd.to_datetime(df["时间戳"])
-        plt.figure(figsize=(15, 8))
-        # 按类别分组统计数量
-        for obj_class, group in df.groupby("类别"):
-            if obj_class in self.selected_classes:
-                plt.plot(
-                    group["时间戳"],
-                    group["总数量"],
-                    marker="o",
-                    linestyle="-",
-                    label=obj_class,
+        # 统计面板的数量历史：最近 STATS_WINDOW 帧的平均值和历史最大值
+        self.count_history = CountSeries(["总数量"], capacity=STATS_WINDOW)
+        # 计数条、阈值条和统计面板的合成器，缓存各画面尺寸的静态精灵图
+        self.overlay = HudOverlay()
+        # 可选的运动门控 (MotionGate)，为None时每帧都检测整幅画面
+        self.motion_gate = None
+        self.last_detections = np.zeros((0, 6), dtype=np.float32)
+        # 推理参数 (输入尺寸、阈值等)，由 apply_profile 设置，为空时使用模型默认值
+        self.predict_options = {}
+
+    def apply_profile(self, profile):
+        """应用性能配置中的推理参数，下一次推理即生效"""
+        self.predict_options = {
+            key: profile[key] for key in PREDICT_KEYS if key in profile
+        }
+
+    @property
+    def selected_classes(self):
+        """需要识别的类别名称"""
+        return self._selected_classes
+
+    @selected_classes.setter
+    def selected_classes(self, classes):
+        """设置识别类别，同时更新按类别id索引的布尔掩码和推理时的类别id
+
+        类别id传给模型推理，NMS和检测框解码阶段即跳过未选择的类别；
+        全部类别都选择时为None，不做过滤。
+        """
+        self._selected_classes = set(classes)
+        names = self.model.names
+        self.class_mask = np.array(
+            [names[i] in self._selected_classes for i in range(len(names))],
+            dtype=bool,
+        )
+        self.class_ids = (
+            None if self.class_mask.all() else np.flatnonzero(self.class_mask).tolist()
+        )
+
+    def share_model(self, name):
+        """创建共享本检测器模型的检测器，用于多路视频流分别计数和保存结果
+
+        新检测器有独立的计数状态，结果写入以name为前缀的文件；
+        检测历史数据库不区分视频流，因此不记录检测历史。
+        """
+        detector = copy.copy(self)
+        detector.history = None
+        detector.results_writer = None
+        if self.results_writer is not None:
+            detector.results_writer = ResultsWriter(
+                self.results_dir,
+                prefix=f"{name}_object_detection",
+                sink_class=self.results_writer.sink_class,
+            )
+        detector.session_start = time.time()
+        detector.total_objects = 0
+        detector.class_counts = {}
+        detector.current_counts = np.zeros_like(self.current_counts)
+        detector.count_history = CountSeries(["总数量"], capacity=STATS_WINDOW)
+        detector.overlay = HudOverlay()
+        detector.motion_gate = None
+        detector.last_detections = np.zeros((0, 6), dtype=np.float32)
+        return detector
+
+    def copy_settings(self, source):
+        """沿用另一个检测器的识别类别、密度图类别和推理参数"""
+        self._selected_classes = source._selected_classes
+        self.class_mask = source.class_mask
+        self.class_ids = source.class_ids
+        self.density_classes = source.density_classes
+        self.predict_options = source.predict_options
+
+    def counts_to_dict(self, counts):
+        """把按类别id索引的数量数组转换为 {类别: 数量}，只包含非零类别"""
+        names = self.model.names
+        return {names[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+
+    def save_to_csv(self, counts):
+        """保存一帧的各类别数量 (按类别id索引的数组)，由后台写入器写为一行"""
+        self.total_objects = int(counts.sum())
+        self.class_counts = self.counts_to_dict(counts)
+        if self.results_writer is not None:
+            self.results_writer.record(self.class_counts, self.selected_classes)
+
+    def close(self):
+        """写入剩余的检测结果并关闭结果文件"""
+        if self.results_writer is not None:
+            self.results_writer.close()
+
+    def sync_results(self):
+        """等待缓冲的检测结果写入文件和检测历史，超时时只使用已写入的数据"""
+        if self.results_writer is not None and not self.results_writer.sync():
+            print("等待检测结果写入超时，最近的数据可能未包含在内")
+
+    def query_results(self, start=None, end=None):
+        """从检测历史中查询识别类别的逐帧计数，默认为本次运行的全部数据"""
+        self.sync_results()
+        start = self.session_start if start is None else start
+        return self.history.query_frames(start, end, self.selected_classes)
+
+    def result_files(self):
+        """本次运行写入的结果文件，没有时使用最近的一个历史文件"""
+        if self.results_writer is not None:
+            self.sync_results()
+            if self.results_writer.paths:
+                return list(self.results_writer.paths)
+        result_files = []
+        for sink_class in SINK_CLASSES.values():
+            pattern = "object_detection_*" + sink_class.extension
+            result_files += glob.glob(os.path.join(self.results_dir, pattern))
+        if not result_files:
+            return []
+        return [max(result_files, key=os.path.getctime)]
+
+    def export_results(self, path, start=None, end=None):
+        """把本次运行的检测结果 (识别类别) 导出为CSV，返回导出的行数"""
+        classes = sorted(self.selected_classes)
+        if self.history is not None:
+            rows = self.query_results(start, end)
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["时间戳", "总数量"] + classes)
+                writer.writerows(
+                    [format_timestamp(timestamp), total]
+                    + [counts.get(cls, 0) for cls in classes]
+                    for timestamp, total, counts in rows
                 )
+            return len(rows)
+        df = read_results(self.result_files(), classes, start, end)
+        df.to_csv(path, index=False, date_format="%Y-%m-%d %H:%M:%S.%f")
+        return len(df)
+
+    def plot_trends(self, start=None, end=None):
+        """绘制并保存检测趋势图，start/end限定时间范围"""
+        import matplotlib.pyplot as plt
+
+        set_chinese_font(plt)
+        if self.history is not None:
+            # 从检测历史中只查询识别类别和时间范围内的数据
+            rows = self.query_results(start, end)
+            if not rows:
+                print("本次运行没有检测数据！")
+                return
+            times = [datetime.fromtimestamp(timestamp) for timestamp, _, _ in rows]
+            series = {
+                obj_class: [counts.get(obj_class, 0) for _, _, counts in rows]
+                for obj_class in sorted(self.selected_classes)
+            }
+        else:
+            result_files = self.result_files()
+            if not result_files:
+                print("未找到检测结果文件！")
+                return
+            print(f"正在处理文件: {', '.join(result_files)}")
+            # 只读取时间戳和识别类别的数量列
+            df = read_results(result_files, sorted(self.selected_classes), start, end)
+            times = df["时间戳"]
+            series = {
+                obj_class: df[obj_class]
+                for obj_class in sorted(self.selected_classes)
+                if obj_class in df.columns
+            }
+        plt.figure(figsize=(15, 8))
+        # 每个类别一条曲线，逐帧数量
+        for obj_class, counts in series.items():
+            plt.plot(times, counts, marker="o", linestyle="-", label=obj_class)
         plt.title("目标检测数量趋势图", fontsize=16, fontweight="bold")
         plt.xlabel("时间", fontsize=12)
         plt.ylabel("目标数量", fontsize=12)
@@ -103,160 +268,20 @@ class ObjectDetector:
         print(f"趋势图已保存到: {output_file}")
         plt.show()
 
-    def draw_counting_bar(self, frame, current_count):
-        """绘制计数条"""
-        bar_width = 200
-        bar_height = 25
-        padding = 20
-        bar_x = padding
-        bar_y = padding
-        percentage = current_count / max(1, self.threshold)
-        filled_width = min(int(percentage * bar_width), bar_width)
-        status, color = self.get_crowd_status(current_count)
-        cv2.rectangle(
-            frame,
-            (bar_x - 5, bar_y - 5),
-            (bar_x + bar_width + 5, bar_y + bar_height + 5),
-            (180, 180, 180),
-            -1,
-        )
-        cv2.rectangle(
-            frame,
-            (bar_x, bar_y),
-            (bar_x + bar_width, bar_y + bar_height),
-            (50, 50, 50),
-            -1,
-        )
-        cv2.rectangle(
-            frame, (bar_x, bar_y), (bar_x + filled_width, bar_y + bar_height), color, -1
-        )
-        cv2.rectangle(
-            frame,
-            (bar_x, bar_y),
-            (bar_x + bar_width, bar_y + bar_height),
-            (180, 180, 180),
-            1,
-        )
-        label = f"COUNT: {current_count}"
-        text_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-        text_x = bar_x + 10
-        text_y = bar_y + bar_height // 2 + text_size[1] // 2
-        cv2.putText(
-            frame,
-            label,
-            (text_x, text_y),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.7,
-            (255, 255, 255),
-            2,
-        )
+    def draw_hud(self, frame, current_count):
+        """在帧上叠加计数条、阈值条和统计面板
 
-    def draw_threshold_bar(self, frame, current_count):
-        """绘制阈值条"""
-        bar_width = 250
-        bar_height = 25
-        padding = 20
-        bar_x = frame.shape[1] - bar_width - padding
-        bar_y = padding
-        percentage = min((current_count / max(1, self.threshold)), 1.0)
-        percentage_display = min(int(percentage * 100), 100)
-        filled_width = min(int(percentage * bar_width), bar_width)
+        静态部分缓存为精灵图，由 HudOverlay 只重绘变化的填充条和数字。
+        """
+        self.count_history.append((current_count,))
         status, color = self.get_crowd_status(current_count)
-        cv2.rectangle(
-            frame,
-            (bar_x - 5, bar_y - 5),
-            (bar_x + bar_width + 5, bar_y + bar_height + 5),
-            (180, 180, 180),
-            -1,
-        )
-        cv2.rectangle(
-            frame,
-            (bar_x, bar_y),
-            (bar_x + bar_width, bar_y + bar_height),
-            (50, 50, 50),
-            -1,
-        )
-        cv2.rectangle(
-            frame, (bar_x, bar_y), (bar_x + filled_width, bar_y + bar_height), color, -1
-        )
-        cv2.rectangle(
-            frame,
-            (bar_x, bar_y),
-            (bar_x + bar_width, bar_y + bar_height),
-            (180, 180, 180),
-            1,
-        )
-        label = f"THRESHOLD: {percentage_display}%"
-        text_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-        text_x = bar_x + bar_width - text_size[0] - 10
-        text_y = bar_y + bar_height // 2 + text_size[1] // 2
-        cv2.putText(
-            frame,
-            label,
-            (text_x, text_y),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.7,
-            (255, 255, 255),
-            2,
-        )
-
-    def draw_statistics_panel(self, frame, current_count):
-        """绘制统计面板"""
-        panel_width = 250
-        panel_height = 120
-        panel_x = 20
-        panel_y = frame.shape[0] - panel_height - 40
-        self.max_count = getattr(self, "max_count", 0)
-        self.max_count = max(self.max_count, current_count)
-        self.count_history = getattr(self, "count_history", [])
-        self.count_history.append(current_count)
-        if len(self.count_history) > 100:
-            self.count_history.pop(0)
-        avg_count = (
-            sum(self.count_history) / len(self.count_history)
-            if self.count_history
-            else 0
-        )
-        cv2.rectangle(
+        self.overlay.draw(
             frame,
-            (panel_x, panel_y),
-            (panel_x + panel_width, panel_y + panel_height),
-            (44, 44, 44),
-            -1,
-        )
-        cv2.rectangle(
-            frame,
-            (panel_x, panel_y),
-            (panel_x + panel_width, panel_y + panel_height),
-            (180, 180, 180),
-            1,
-        )
-        cv2.putText(
-            frame,
-            f"当前数量: {current_count}",
-            (panel_x + 10, panel_y + 35),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.7,
-            (255, 255, 255),
-            2,
-        )
-        cv2.putText(
-            frame,
-            f"最大数量: {self.max_count}",
-            (panel_x + 10, panel_y + 65),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.7,
-            (255, 255, 255),
-            2,
-        )
-        cv2.putText(
-            frame,
-            f"平均数量: {avg_count:.1f}",
-            (panel_x + 10, panel_y + 95),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.7,
-            (255, 255, 255),
-            2,
+            current_count,
+            self.threshold,
+            color,
+            int(self.count_history.peak[0]),
+            float(self.count_history.mean()[0]),
         )
 
     def get_crowd_status(self, current_count):
@@ -269,43 +294,95 @@ class ObjectDetector:
         else:
             return ("CRITICAL", (0, 0, 255))
 
-    def draw_detection(self, frame, detections):
-        """在帧上绘制检测结果"""
-        detection_info = []
-        class_counter = {}
-        for detection in detections:
-            x1, y1, x2, y2 = map(int, detection[:4])
-            cls = int(detection[5])
-            class_name = self.model.names[cls]
-            if class_name not in self.selected_classes:
-                continue
-            class_counter[class_name] = class_counter.get(class_name, 0) + 1
+    def draw_detection(self, frame, detections, draw=True):
+        """在帧上绘制检测结果，draw为False时只统计不绘制
+
+        统计结果保存在 current_counts (按类别id索引的数量数组) 中并返回。
+        """
+        cls = detections[:, 5].astype(np.intp)
+        keep = self.class_mask[cls]
+        cls = cls[keep]
+        counts = np.bincount(cls, minlength=len(self.class_mask))
+        self.current_counts = counts
+        self.total_objects = len(cls)
+        if not draw or not len(cls):
+            return counts
+        names = self.model.names
+        boxes = detections[keep, :4].astype(np.intp)
+        for (x1, y1, x2, y2), class_id in zip(boxes.tolist(), cls.tolist()):
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
             # 每个框都显示类别名称
             cv2.putText(
                 frame,
-                class_name,
+                names[class_id],
                 (x1, y1 - 10),
                 cv2.FONT_HERSHEY_SIMPLEX,
                 0.8,
                 (0, 255, 0),
                 2,
             )
-        if class_counter:
-            label = " ".join([f"{k}={v}" for k, v in class_counter.items()])
-            cv2.putText(
-                frame, label, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2
-            )
-        for cname, count in class_counter.items():
-            for _ in range(count):
-                detection_info.append({"class": cname})
-        self.current_detection_info = detection_info
-        self.total_objects = sum(class_counter.values())
+        label = " ".join(f"{k}={v}" for k, v in self.counts_to_dict(counts).items())
+        cv2.putText(frame, label, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        return counts
 
     def process_frame(self, frame):
         """处理一帧图像并返回处理后的帧"""
-        results = self.model.predict(frame)
-        if len(results) > 0:
-            detections = results[0].boxes.data.cpu().numpy()
-            self.draw_detection(frame, detections)
+        self.process_batch([frame])
         return frame
+
+    def predict_batch(self, frames, gated=True):
+        """对多帧执行一次推理，返回每帧的检测数组 [x1, y1, x2, y2, conf, cls]
+
+        gated为False时不使用运动门控，用于多路视频流合并的批次 (各帧来自
+        不同画面，不能共用一个背景模型)。
+        """
+        if gated and self.motion_gate is not None:
+            return self.predict_gated(frames)
+        detections_list = self.model.predict(
+            frames, classes=self.class_ids, **self.predict_options
+        )
+        if detections_list:
+            self.last_detections = detections_list[-1]
+        return detections_list
+
+    def predict_gated(self, frames):
+        """经运动门控后推理：静止帧沿用上次结果，运动帧只检测运动区域"""
+        rois = [self.motion_gate.find_roi(frame) for frame in frames]
+        crops = [
+            np.ascontiguousarray(frame[roi[1] : roi[3], roi[0] : roi[2]])
+            for frame, roi in zip(frames, rois)
+            if roi is not None
+        ]
+        results = (
+            self.model.predict(crops, classes=self.class_ids, **self.predict_options)
+            if crops
+            else []
+        )
+        results = iter(results)
+        detections_list = []
+        for roi in rois:
+            if roi is not None:
+                x1, y1, x2, y2 = roi
+                detections = next(results).copy()
+                detections[:, [0, 2]] += x1
+                detections[:, [1, 3]] += y1
+                # 运动区域之外的目标沿用上一次的检测结果
+                previous = self.last_detections
+                if len(previous):
+                    cx = (previous[:, 0] + previous[:, 2]) / 2
+                    cy = (previous[:, 1] + previous[:, 3]) / 2
+                    outside = (cx < x1) | (cx >= x2) | (cy < y1) | (cy >= y2)
+                    detections = np.concatenate([previous[outside], detections])
+                self.last_detections = detections
+            detections_list.append(self.last_detections)
+        return detections_list
+
+    def process_batch(self, frames, draw=True):
+        """批量处理多帧图像，一次推理调用处理全部帧
+
+        返回 [(处理后的帧, 各类别数量数组), ...]，顺序与输入一致。
+        """
+        return [
+            (frame, self.draw_detection(frame, detections, draw))
+            for frame, detections in zip(frames, self.predict_batch(frames))
+        ]
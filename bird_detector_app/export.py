@@ -0,0 +1,100 @@
+"""
+模型导出模块 - 将PyTorch模型导出为ONNX或OpenVINO格式，缓存在模型文件旁
+Creater Tz2H
+
+用法示例:
+    python -m bird_detector_app.export --format onnx
+    python -m bird_detector_app.export -m resources/models/yolo11m.pt --format all
+
+导出只需执行一次，之后在 config.txt 中设置 backend=onnxruntime 或
+backend=openvino，运行时使用导出的模型，不再需要导入torch。
+"""
+
+import argparse
+import os
+import sys
+
+from utils.config_manager import load_initial_config
+
+# 导出格式，以及使用该格式的推理后端
+EXPORT_FORMATS = ("onnx", "openvino")
+BACKEND_FORMATS = {"onnxruntime": "onnx", "openvino": "openvino"}
+
+
+def exported_path(model_path, export_format, int8=False):
+    """导出模型的缓存路径，与ultralytics的默认导出位置一致
+
+    int8为True时返回 bird_detector_app.quantize 生成的INT8量化模型路径。
+    """
+    stem = os.path.splitext(model_path)[0]
+    if int8:
+        stem += "_int8"
+    if export_format == "onnx":
+        return stem + ".onnx"
+    if export_format == "openvino":
+        return stem + "_openvino_model"
+    raise ValueError(f"不支持的导出格式: {export_format}")
+
+
+def is_up_to_date(model_path, target):
+    """导出的模型是否存在且不早于原模型"""
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(
+        model_path
+    )
+
+
+def export_model(model_path, export_format, imgsz=640, force=False):
+    """导出模型并返回导出文件路径，已有最新的导出结果时直接返回
+
+    导出时使用动态输入尺寸，性能配置中修改输入尺寸和批大小后无需重新导出。
+    """
+    target = exported_path(model_path, export_format)
+    if not force and is_up_to_date(model_path, target):
+        print(f"已存在导出的模型: {target}")
+        return target
+    from ultralytics import YOLO
+
+    options = {"simplify": True} if export_format == "onnx" else {}
+    output = YOLO(model_path).export(
+        format=export_format, imgsz=imgsz, dynamic=True, **options
+    )
+    print(f"模型已导出到: {output}")
+    return str(output)
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    config = load_initial_config()
+    parser = argparse.ArgumentParser(
+        prog="python -m bird_detector_app.export",
+        description="将YOLO模型导出为ONNX或OpenVINO格式，用于CPU推理",
+    )
+    parser.add_argument(
+        "-m", "--model", default=config["model_path"], help="YOLO模型路径 (.pt)"
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=EXPORT_FORMATS + ("all",),
+        default="onnx",
+        help="导出格式，all表示全部导出",
+    )
+    parser.add_argument("--imgsz", type=int, default=640, help="导出时的输入尺寸")
+    parser.add_argument("--force", action="store_true", help="已有导出结果时也重新导出")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = parse_args(argv)
+    if not os.path.exists(args.model):
+        print(f"模型文件不存在: {args.model}", file=sys.stderr)
+        return 1
+    formats = EXPORT_FORMATS if args.format == "all" else (args.format,)
+    for export_format in formats:
+        export_model(args.model, export_format, args.imgsz, args.force)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
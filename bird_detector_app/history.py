@@ -0,0 +1,281 @@
+"""
+检测历史模块 - 使用SQLite保存逐帧计数，支持按时间范围和类别查询
+Creater Tz2H
+
+用法示例 (查询最近7天每小时的最大数量):
+    python -m bird_detector_app.history --days 7 --interval 3600 -c bird
+
+表结构:
+- frames: 每帧一行 (时间戳, 总数量)
+- counts: 每帧每个出现的类别一行，索引为 (时间戳, 类别)
+- minute_counts / minute_frames: 按分钟预先汇总的最大值、总和与帧数，
+  按小时、按天的统计只需扫描汇总表，数百万帧的历史也能在毫秒级返回
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from utils.config_manager import load_initial_config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    total INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frames_timestamp ON frames (timestamp);
+CREATE TABLE IF NOT EXISTS counts (
+    frame_id INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    class TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS counts_timestamp_class ON counts (timestamp, class);
+CREATE TABLE IF NOT EXISTS minute_counts (
+    minute INTEGER NOT NULL,
+    class TEXT NOT NULL,
+    max_count INTEGER NOT NULL,
+    sum_count INTEGER NOT NULL,
+    PRIMARY KEY (minute, class)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS minute_frames (
+    minute INTEGER PRIMARY KEY,
+    frames INTEGER NOT NULL,
+    max_total INTEGER NOT NULL,
+    sum_total INTEGER NOT NULL
+);
+"""
+
+
+def to_epoch(value):
+    """datetime或秒数统一转换为Unix时间戳，None保持不变"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+class DetectionHistory:
+    """SQLite检测历史
+
+    使用WAL模式，写入线程批量插入的同时界面线程可以并发查询。
+    每个线程使用各自的数据库连接。
+    """
+
+    def __init__(self, path):
+        """打开 (必要时创建) 数据库"""
+        self.path = path
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        """当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def insert(self, rows):
+        """在一个事务中批量写入多帧 [(时间戳, 总数量, {类别: 数量}), ...]
+
+        帧id由本批第一帧之前的最大id顺延，读取最大id前先取得写锁，
+        多个写入者 (多个进程或连接) 同时写入时不会分到相同的id。
+        """
+        if not rows:
+            return
+        minute_counts = {}
+        minute_frames = {}
+        conn = self.connection()
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            (next_id,) = cursor.execute(
+                "SELECT COALESCE(MAX(id), 0) + 1 FROM frames"
+            ).fetchone()
+            frame_rows = []
+            count_rows = []
+            for frame_id, (timestamp, total, counts) in enumerate(rows, next_id):
+                frame_rows.append((frame_id, timestamp, total))
+                minute = int(timestamp // 60)
+                frames, max_total, sum_total = minute_frames.get(minute, (0, 0, 0))
+                minute_frames[minute] = (
+                    frames + 1,
+                    max(max_total, total),
+                    sum_total + total,
+                )
+                for cls, count in counts.items():
+                    if not count:
+                        continue
+                    count_rows.append((frame_id, timestamp, cls, count))
+                    max_count, sum_count = minute_counts.get((minute, cls), (0, 0))
+                    minute_counts[minute, cls] = (
+                        max(max_count, count),
+                        sum_count + count,
+                    )
+            cursor.executemany("INSERT INTO frames VALUES (?, ?, ?)", frame_rows)
+            cursor.executemany("INSERT INTO counts VALUES (?, ?, ?, ?)", count_rows)
+            cursor.executemany(
+                "INSERT INTO minute_frames VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (minute) DO UPDATE SET "
+                "frames = frames + excluded.frames, "
+                "max_total = MAX(max_total, excluded.max_total), "
+                "sum_total = sum_total + excluded.sum_total",
+                [(minute, *values) for minute, values in minute_frames.items()],
+            )
+            cursor.executemany(
+                "INSERT INTO minute_counts VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (minute, class) DO UPDATE SET "
+                "max_count = MAX(max_count, excluded.max_count), "
+                "sum_count = sum_count + excluded.sum_count",
+                [(*key, *values) for key, values in minute_counts.items()],
+            )
+
+    @staticmethod
+    def range_clause(column, start, end):
+        """时间范围条件 (包含start，不包含end) 及其参数"""
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append(f"{column} < ?")
+            params.append(end)
+        return clauses, params
+
+    def query_frames(self, start=None, end=None, classes=None):
+        """按时间顺序返回逐帧计数 [(时间戳, 总数量, {类别: 数量}), ...]
+
+        start/end为datetime或Unix时间戳；classes为None时返回全部类别。
+        """
+        start, end = to_epoch(start), to_epoch(end)
+        conn = self.connection()
+        clauses, params = self.range_clause("timestamp", start, end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        frames = conn.execute(
+            f"SELECT id, timestamp, total FROM frames {where} ORDER BY timestamp",
+            params,
+        ).fetchall()
+        if classes is not None:
+            classes = list(classes)
+            if not classes:
+                return [(timestamp, total, {}) for _, timestamp, total in frames]
+            clauses.append(f"class IN ({', '.join('?' * len(classes))})")
+            params += classes
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        frame_counts = {}
+        for frame_id, cls, count in conn.execute(
+            f"SELECT frame_id, class, count FROM counts {where}", params
+        ):
+            frame_counts.setdefault(frame_id, {})[cls] = count
+        return [
+            (timestamp, total, frame_counts.get(frame_id, {}))
+            for frame_id, timestamp, total in frames
+        ]
+
+    def aggregate(self, interval=3600, start=None, end=None, classes=None):
+        """按时间段统计各类别的最大数量和平均数量
+
+        interval为时间段长度 (秒，按整分钟对齐)，返回
+        [(时间段起点, {类别: (最大数量, 平均数量)}), ...]，"总数量" 也作为一个类别。
+        只查询按分钟汇总的表，不扫描逐帧数据。
+        """
+        start, end = to_epoch(start), to_epoch(end)
+        minutes = max(1, int(interval // 60))
+        first = None if start is None else int(start // 60)
+        last = None if end is None else int(-(-end // 60))
+        conn = self.connection()
+        clauses, params = self.range_clause("minute", first, last)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        buckets = {}
+        for bucket, frames, max_total, sum_total in conn.execute(
+            f"SELECT minute / ? AS bucket, SUM(frames), MAX(max_total), "
+            f"SUM(sum_total) FROM minute_frames {where} GROUP BY bucket",
+            [minutes] + params,
+        ):
+            buckets[bucket] = (frames, {"总数量": (max_total, sum_total / frames)})
+        if classes is not None:
+            classes = list(classes)
+            clauses.append(f"class IN ({', '.join('?' * len(classes))})")
+            params += classes
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        if classes is None or classes:
+            for bucket, cls, max_count, sum_count in conn.execute(
+                f"SELECT minute / ? AS bucket, class, MAX(max_count), "
+                f"SUM(sum_count) FROM minute_counts {where} GROUP BY bucket, class",
+                [minutes] + params,
+            ):
+                if bucket in buckets:
+                    frames, stats = buckets[bucket]
+                    stats[cls] = (max_count, sum_count / frames)
+        return [
+            (bucket * minutes * 60, buckets[bucket][1]) for bucket in sorted(buckets)
+        ]
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    config = load_initial_config()
+    parser = argparse.ArgumentParser(
+        prog="python -m bird_detector_app.history",
+        description="按时间段统计检测历史中各类别的最大数量和平均数量",
+    )
+    parser.add_argument(
+        "--db", default=config["history_db"], help="检测历史数据库路径"
+    )
+    parser.add_argument("--days", type=float, default=1, help="统计最近多少天")
+    parser.add_argument(
+        "--interval", type=int, default=3600, help="时间段长度 (秒)，默认每小时"
+    )
+    parser.add_argument(
+        "-c", "--classes", help="逗号分隔的类别，默认读取 config.txt 中的类别"
+    )
+    args = parser.parse_args(argv)
+    if args.classes is None:
+        args.classes = ",".join(config["selected_classes"])
+    args.classes = [cls for cls in args.classes.split(",") if cls]
+    return args
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = parse_args(argv)
+    if not args.db or not os.path.exists(args.db):
+        print(f"检测历史数据库不存在: {args.db}", file=sys.stderr)
+        return 1
+    history = DetectionHistory(args.db)
+    start_time = time.perf_counter()
+    rows = history.aggregate(
+        args.interval, start=time.time() - args.days * 86400, classes=args.classes
+    )
+    elapsed = time.perf_counter() - start_time
+    print("\t".join(["时间段"] + [f"{cls}(最大/平均)" for cls in args.classes]))
+    for bucket, stats in rows:
+        cells = [datetime.fromtimestamp(bucket).strftime("%Y-%m-%d %H:%M")]
+        for cls in args.classes:
+            max_count, mean_count = stats.get(cls, (0, 0.0))
+            cells.append(f"{max_count}/{mean_count:.2f}")
+        print("\t".join(cells))
+    print(f"查询耗时: {elapsed * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
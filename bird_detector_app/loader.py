@@ -0,0 +1,41 @@
+"""
+模型加载模块 - 在后台线程中创建检测器，避免阻塞界面
+Creater Tz2H
+"""
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from bird_detector_app.detector import ObjectDetector
+
+# 程序退出时等待加载线程结束的最长时间（秒）
+LOAD_WAIT_TIMEOUT = 30.0
+
+
+class ModelLoader(QThread):
+    """模型加载线程"""
+
+    loaded = pyqtSignal(object, str)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, model_path, detector_options=None, parent=None):
+        """初始化模型加载线程，detector_options为传给ObjectDetector的其他参数"""
+        super().__init__(parent)
+        self.model_path = model_path
+        self.detector_options = detector_options or {}
+        self.detector = None
+
+    def run(self):
+        """加载模型并创建检测器"""
+        try:
+            detector = ObjectDetector(self.model_path, **self.detector_options)
+        except Exception as e:
+            self.failed.emit(self.model_path, str(e))
+            return
+        self.detector = detector
+        self.loaded.emit(detector, self.model_path)
+
+    def close_result(self):
+        """关闭加载出的检测器，用于结果不再使用的加载任务，可重复调用"""
+        if self.detector is not None:
+            self.detector.close()
+            self.detector = None
@@ -0,0 +1,202 @@
+"""
+性能指标模块 - 记录各处理阶段的耗时，并定期写入指标文件
+Creater Tz2H
+
+各阶段的耗时同时保存在两种结构中：
+- 滚动窗口：最近 window 次耗时，用于界面显示分位数
+- 累计直方图：按固定桶累计次数，用于Prometheus文本格式输出
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# 直方图桶上限（秒）
+HISTOGRAM_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+# 界面和指标文件中各阶段的显示顺序
+STAGE_ORDER = (
+    "capture",
+    "preprocess",
+    "inference",
+    "postprocess",
+    "draw",
+    "qt_convert",
+    "chart_update",
+    "end_to_end",
+)
+
+
+class RollingHistogram:
+    """单个阶段的耗时统计"""
+
+    def __init__(self, window=500):
+        """初始化耗时统计"""
+        self.recent = deque(maxlen=window)
+        self.bucket_counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        """记录一次耗时（秒）"""
+        self.recent.append(seconds)
+        self.bucket_counts[bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        """滚动窗口内的耗时统计（毫秒）"""
+        values = sorted(self.recent)
+        if not values:
+            return {"count": self.count}
+
+        def percentile(q):
+            return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+        return {
+            "count": self.count,
+            "mean_ms": round(sum(values) * 1000 / len(values), 3),
+            "p50_ms": round(percentile(0.50), 3),
+            "p95_ms": round(percentile(0.95), 3),
+            "p99_ms": round(percentile(0.99), 3),
+        }
+
+
+class StageMetrics:
+    """各处理阶段耗时的线程安全登记表"""
+
+    def __init__(self, window=500):
+        """初始化登记表"""
+        self.window = window
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        """记录某阶段的一次耗时（秒）"""
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = RollingHistogram(self.window)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def measure(self, stage):
+        """计时上下文：with metrics.measure("draw"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def stage_names(self):
+        """按固定顺序返回已记录的阶段名称"""
+        with self._lock:
+            names = list(self.histograms)
+        order = {name: i for i, name in enumerate(STAGE_ORDER)}
+        return sorted(names, key=lambda name: (order.get(name, len(order)), name))
+
+    def snapshot(self):
+        """各阶段滚动窗口统计 {阶段: 统计}"""
+        with self._lock:
+            summaries = {
+                name: histogram.summary() for name, histogram in self.histograms.items()
+            }
+        return {name: summaries[name] for name in self.stage_names()}
+
+    def to_prometheus(self):
+        """导出为Prometheus文本格式"""
+        lines = [
+            "# HELP bird_detector_stage_seconds Per-stage processing latency",
+            "# TYPE bird_detector_stage_seconds histogram",
+        ]
+        with self._lock:
+            items = [
+                (name, list(h.bucket_counts), h.count, h.total)
+                for name, h in self.histograms.items()
+            ]
+        for name, bucket_counts, count, total in items:
+            cumulative = 0
+            for bound, bucket_count in zip(HISTOGRAM_BUCKETS, bucket_counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'bird_detector_stage_seconds_bucket{{stage="{name}",le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(
+                f'bird_detector_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {count}'
+            )
+            lines.append(f'bird_detector_stage_seconds_sum{{stage="{name}"}} {total}')
+            lines.append(f'bird_detector_stage_seconds_count{{stage="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class MetricsWriter:
+    """后台定期写入指标文件
+
+    文件扩展名为 .prom 时写入Prometheus文本格式（整体替换，供
+    node_exporter的textfile采集器读取），否则以JSONL格式逐行追加。
+    """
+
+    def __init__(self, metrics, path, interval=10.0):
+        """初始化指标写入器"""
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        """启动写入线程"""
+        output_dir = os.path.dirname(self.path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止写入线程，并写入最后一次指标"""
+        self._stop_event.set()
+        self._thread.join()
+
+    def run(self):
+        """写入线程主循环"""
+        while not self._stop_event.wait(self.interval):
+            self.write()
+        self.write()
+
+    def write(self):
+        """写入一次指标"""
+        try:
+            if self.path.endswith(".prom"):
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(self.metrics.to_prometheus())
+                os.replace(tmp_path, self.path)
+            else:
+                record = {
+                    "时间戳": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "stages": self.metrics.snapshot(),
+                }
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"写入指标文件失败: {e}")
+
+
+# 进程内共享的指标登记表
+stage_metrics = StageMetrics()
@@ -0,0 +1,82 @@
+"""
+运动门控模块 - 使用背景差分判断画面是否变化，并给出运动区域
+Creater Tz2H
+"""
+
+import cv2
+
+# 背景建模使用的缩略图宽度
+GATE_WIDTH = 160
+# 运动区域向外扩展的比例，避免目标被裁切
+ROI_PADDING = 0.15
+# 运动区域超过画面的该比例时直接检测整帧
+FULL_FRAME_RATIO = 0.5
+
+
+class MotionGate:
+    """运动门控
+
+    threshold: 背景差分的方差阈值，越小越灵敏。
+    min_area: 运动区域占画面的最小比例，小于该值的变化视为噪声。
+    """
+
+    def __init__(self, threshold=16.0, min_area=0.001, history=500):
+        """初始化运动门控"""
+        self.threshold = float(threshold)
+        self.min_area = float(min_area)
+        self.history = history
+        self.reset()
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.frames_gated = 0
+        self.frames_inferred = 0
+        self.frames_roi = 0
+
+    def reset(self):
+        """重新建立背景模型，用于切换到不连续的画面"""
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(
+            history=self.history, varThreshold=self.threshold, detectShadows=True
+        )
+
+    def find_roi(self, frame):
+        """返回运动区域 (x1, y1, x2, y2)，无运动时返回None
+
+        多个运动区域合并为一个外接矩形，运动范围较大时返回整帧。
+        """
+        h, w = frame.shape[:2]
+        scale = GATE_WIDTH / w
+        small = cv2.resize(
+            frame, (GATE_WIDTH, max(1, int(h * scale))), interpolation=cv2.INTER_AREA
+        )
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        mask = self.subtractor.apply(gray)
+        # 去掉阴影 (127) 和噪点
+        _, mask = cv2.threshold(mask, 200, 255, cv2.THRESH_BINARY)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
+        mask = cv2.dilate(mask, self.kernel, iterations=2)
+        contours, _ = cv2.findContours(
+            mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+        )
+        min_pixels = self.min_area * mask.shape[0] * mask.shape[1]
+        boxes = [
+            cv2.boundingRect(contour)
+            for contour in contours
+            if cv2.contourArea(contour) >= min_pixels
+        ]
+        if not boxes:
+            self.frames_gated += 1
+            return None
+        self.frames_inferred += 1
+        x1 = min(x for x, _, _, _ in boxes) / scale
+        y1 = min(y for _, y, _, _ in boxes) / scale
+        x2 = max(x + bw for x, _, bw, _ in boxes) / scale
+        y2 = max(y + bh for _, y, _, bh in boxes) / scale
+        pad_x = (x2 - x1) * ROI_PADDING
+        pad_y = (y2 - y1) * ROI_PADDING
+        x1 = max(0, int(x1 - pad_x))
+        y1 = max(0, int(y1 - pad_y))
+        x2 = min(w, int(x2 + pad_x))
+        y2 = min(h, int(y2 + pad_y))
+        if (x2 - x1) * (y2 - y1) >= FULL_FRAME_RATIO * w * h:
+            return (0, 0, w, h)
+        self.frames_roi += 1
+        return (x1, y1, x2, y2)
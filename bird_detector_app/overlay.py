@@ -0,0 +1,170 @@
+"""
+叠加层模块 - 计数条、阈值条和统计面板的HUD合成
+Creater Tz2H
+
+底框、背景和边框等静态部分按画面尺寸只绘制一次，缓存为各元素大小的
+精灵图；填充条和数字变化时才用精灵图恢复图层并重绘这部分，每帧只把各
+图层按区域整块复制到画面上。HUD元素都是不透明的矩形，不需要逐像素混合。
+"""
+
+import functools
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.7
+FONT_THICKNESS = 2
+TEXT_COLOR = (255, 255, 255)
+BORDER_COLOR = (180, 180, 180)
+BAR_BG_COLOR = (50, 50, 50)
+PANEL_BG_COLOR = (44, 44, 44)
+# 计数条、阈值条距画面边缘的距离，底框比条向外扩展的宽度
+PADDING = 20
+BAR_MARGIN = 5
+BAR_HEIGHT = 25
+COUNT_BAR_WIDTH = 200
+THRESHOLD_BAR_WIDTH = 250
+PANEL_WIDTH = 250
+PANEL_HEIGHT = 120
+# 统计面板底边到画面底部的距离
+PANEL_BOTTOM = 40
+# 统计面板各行文字基线相对面板顶部的位置
+PANEL_LINES = (35, 65, 95)
+# 缓存精灵图的画面尺寸数量上限
+MAX_LAYOUTS = 8
+
+
+@functools.lru_cache(maxsize=256)
+def text_size(label):
+    """标签文字的 (宽, 高)，计数和百分比的取值有限，缓存后不再重复计算"""
+    return cv2.getTextSize(label, FONT, FONT_SCALE, FONT_THICKNESS)[0]
+
+
+def put_text(image, label, origin):
+    """以HUD统一的字体绘制文字"""
+    cv2.putText(image, label, origin, FONT, FONT_SCALE, TEXT_COLOR, FONT_THICKNESS)
+
+
+class Sprite:
+    """HUD中的一个元素：静态精灵图、绘制了动态内容的图层和左上角在画面中的位置"""
+
+    def __init__(self, x, y, width, height):
+        """创建空白精灵图，静态部分由调用方绘制到 static 上"""
+        self.x = x
+        self.y = y
+        self.static = np.zeros((height, width, 3), dtype=np.uint8)
+        self.layer = self.static.copy()
+        self.content = None
+
+    def begin(self, content):
+        """用静态精灵图恢复图层，返回待绘制动态内容的图层
+
+        content描述动态内容，与上次相同时图层无需重绘，返回None。
+        """
+        if content == self.content:
+            return None
+        self.content = content
+        np.copyto(self.layer, self.static)
+        return self.layer
+
+    def composite(self, frame):
+        """把图层复制到画面上，超出画面的部分被裁掉"""
+        h, w = frame.shape[:2]
+        x0, y0 = max(self.x, 0), max(self.y, 0)
+        x1 = min(self.x + self.layer.shape[1], w)
+        y1 = min(self.y + self.layer.shape[0], h)
+        if x0 < x1 and y0 < y1:
+            frame[y0:y1, x0:x1] = self.layer[
+                y0 - self.y : y1 - self.y, x0 - self.x : x1 - self.x
+            ]
+
+
+def bar_sprite(x, y, width):
+    """计数条或阈值条的精灵图，(x, y) 为条 (不含底框) 的左上角"""
+    m = BAR_MARGIN
+    sprite = Sprite(x - m, y - m, width + 2 * m + 1, BAR_HEIGHT + 2 * m + 1)
+    cv2.rectangle(
+        sprite.static, (0, 0), (width + 2 * m, BAR_HEIGHT + 2 * m), BORDER_COLOR, -1
+    )
+    cv2.rectangle(sprite.static, (m, m), (m + width, m + BAR_HEIGHT), BAR_BG_COLOR, -1)
+    cv2.rectangle(sprite.static, (m, m), (m + width, m + BAR_HEIGHT), BORDER_COLOR, 1)
+    return sprite
+
+
+def panel_sprite(x, y):
+    """统计面板的精灵图"""
+    sprite = Sprite(x, y, PANEL_WIDTH + 1, PANEL_HEIGHT + 1)
+    corner = (PANEL_WIDTH, PANEL_HEIGHT)
+    cv2.rectangle(sprite.static, (0, 0), corner, PANEL_BG_COLOR, -1)
+    cv2.rectangle(sprite.static, (0, 0), corner, BORDER_COLOR, 1)
+    return sprite
+
+
+def draw_bar(sprite, width, ratio, color, label, align_right=False):
+    """在条的图层上按比例绘制填充部分和标签，不覆盖静态边框"""
+    filled = min(int(ratio * width), width)
+    layer = sprite.begin((filled, color, label))
+    if layer is None:
+        return
+    m = BAR_MARGIN
+    if filled > 0:
+        right = m + min(filled, width - 1)
+        cv2.rectangle(layer, (m + 1, m + 1), (right, m + BAR_HEIGHT - 1), color, -1)
+    label_width, label_height = text_size(label)
+    text_x = m + width - label_width - 10 if align_right else m + 10
+    put_text(layer, label, (text_x, m + BAR_HEIGHT // 2 + label_height // 2))
+
+
+class HudOverlay:
+    """HUD合成器，按画面尺寸缓存计数条、阈值条和统计面板的精灵图"""
+
+    def __init__(self):
+        """初始化合成器"""
+        self.layouts = {}
+
+    def layout(self, shape):
+        """取出画面尺寸对应的 (计数条, 阈值条, 统计面板)，没有时绘制"""
+        key = shape[:2]
+        layout = self.layouts.get(key)
+        if layout is None:
+            if len(self.layouts) >= MAX_LAYOUTS:
+                self.layouts.clear()
+            height, width = key
+            layout = self.layouts[key] = (
+                bar_sprite(PADDING, PADDING, COUNT_BAR_WIDTH),
+                bar_sprite(
+                    width - THRESHOLD_BAR_WIDTH - PADDING, PADDING, THRESHOLD_BAR_WIDTH
+                ),
+                panel_sprite(PADDING, height - PANEL_HEIGHT - PANEL_BOTTOM),
+            )
+        return layout
+
+    def draw(self, frame, count, threshold, color, max_count, avg_count):
+        """在frame上叠加计数条、阈值条和统计面板
+
+        color为填充条颜色，max_count和avg_count显示在统计面板中。
+        """
+        count_bar, threshold_bar, panel = self.layout(frame.shape)
+        ratio = count / max(1, threshold)
+        draw_bar(count_bar, COUNT_BAR_WIDTH, ratio, color, f"COUNT: {count}")
+        ratio = min(ratio, 1.0)
+        draw_bar(
+            threshold_bar,
+            THRESHOLD_BAR_WIDTH,
+            ratio,
+            color,
+            f"THRESHOLD: {min(int(ratio * 100), 100)}%",
+            align_right=True,
+        )
+        labels = (
+            f"当前数量: {count}",
+            f"最大数量: {max_count}",
+            f"平均数量: {avg_count:.1f}",
+        )
+        layer = panel.begin(labels)
+        if layer is not None:
+            for offset, label in zip(PANEL_LINES, labels):
+                put_text(layer, label, (10, offset))
+        for sprite in (count_bar, threshold_bar, panel):
+            sprite.composite(frame)
@@ -0,0 +1,820 @@
+"""
+视频处理流水线模块 - 采集、推理、渲染分别在独立线程中执行
+Creater Tz2H
+"""
+
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from bird_detector_app.metrics import stage_metrics
+from bird_detector_app.scheduler import InferenceScheduler
+from bird_detector_app.streams import (
+    STALL_TIMEOUT,
+    ReconnectingStream,
+    is_stream_url,
+)
+
+# 各阶段之间队列的容量，保持较小以限制延迟
+QUEUE_SIZE = 2
+# 阻塞等待队列的超时时间（秒），用于定期检查停止标志
+QUEUE_TIMEOUT = 0.1
+# 离线模式下视频解码超前的批次数
+DECODE_AHEAD_BATCHES = 2
+# 视频流结束标记
+END_OF_STREAM = object()
+# 多路模式下所有视频流都没有新帧时的等待时间（秒）
+STREAM_POLL_INTERVAL = 0.005
+# 每路视频流最多保留的空闲显示缓冲区数量
+DISPLAY_BUFFERS = 3
+# 停止后仍在等待网络流读取超时的采集线程，线程结束前保留引用
+_detached_stages = []
+# 程序退出时等待这些线程结束的最长时间（秒），略长于网络流的超时时间
+DETACHED_WAIT_TIMEOUT = STALL_TIMEOUT + 1
+
+
+def detach_stage(stage):
+    """不等待已请求停止的阶段线程结束，保留其引用直到线程自行退出"""
+    global _detached_stages
+    _detached_stages = [s for s in _detached_stages if s.isRunning()]
+    if stage.isRunning():
+        _detached_stages.append(stage)
+
+
+def wait_detached_stages(timeout=DETACHED_WAIT_TIMEOUT):
+    """等待已分离的阶段线程结束，最多等待timeout秒，返回是否全部结束
+
+    程序退出前调用，避免线程仍在运行时QThread对象被销毁。
+    """
+    global _detached_stages
+    deadline = time.monotonic() + timeout
+    for stage in _detached_stages:
+        remaining = max(0.0, deadline - time.monotonic())
+        stage.wait(int(remaining * 1000))
+    _detached_stages = [s for s in _detached_stages if s.isRunning()]
+    return not _detached_stages
+
+
+def fit_size(width, height, target_size):
+    """保持宽高比缩放到target_size (宽, 高) 以内的尺寸，target_size为空时不缩放"""
+    if not target_size:
+        return width, height
+    scale = min(target_size[0] / width, target_size[1] / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def frame_to_qimage(frame, size, buffer=None):
+    """把BGR帧缩放到size并包装为QImage，返回 (QImage, 图像数据)
+
+    Format_BGR888 直接使用OpenCV的BGR数据，不做颜色转换；缩放只做一次，
+    结果写入buffer (形状匹配时复用)；尺寸不变时直接包装原帧，不复制。
+    QImage不持有数据，使用期间需要保留返回的图像数据。
+    """
+    h, w = frame.shape[:2]
+    if (w, h) == tuple(size):
+        data = np.ascontiguousarray(frame)
+    else:
+        interpolation = cv2.INTER_AREA if size[0] < w else cv2.INTER_LINEAR
+        data = cv2.resize(frame, tuple(size), dst=buffer, interpolation=interpolation)
+    image = QImage(data.data, size[0], size[1], data.strides[0], QImage.Format_BGR888)
+    return image, data
+
+
+def put_until_stopped(q, item, stage):
+    """向队列放入数据，队列已满时等待，直到阶段被停止"""
+    while stage.is_running():
+        try:
+            q.put(item, timeout=QUEUE_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def get_until_stopped(q, stage):
+    """从队列取出数据，队列为空时等待，阶段停止时返回None"""
+    while stage.is_running():
+        try:
+            return q.get(timeout=QUEUE_TIMEOUT)
+        except queue.Empty:
+            continue
+    return None
+
+
+class LatestFrameQueue:
+    """只保留最新一帧的队列，用于实时摄像头
+
+    put 从不阻塞：尚未被取走的旧帧直接被新帧覆盖并计入丢帧数，
+    采集线程因此能持续读空摄像头驱动的缓冲区 (很多后端会忽略
+    CAP_PROP_BUFFERSIZE)，推理较慢时显示的画面和计数仍然是最新的。
+    接口与 queue.Queue 的 put/get/get_nowait 一致。
+    """
+
+    def __init__(self):
+        """初始化队列"""
+        self._condition = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item, timeout=None):
+        """放入一帧，覆盖尚未取走的旧帧"""
+        with self._condition:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """取出最新一帧，超时仍没有新帧时抛出 queue.Empty"""
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._item is not None, timeout
+            ):
+                raise queue.Empty
+            item, self._item = self._item, None
+        return item
+
+    def get_nowait(self):
+        """取出最新一帧，没有新帧时抛出 queue.Empty"""
+        return self.get(timeout=0)
+
+
+class PipelineStage(QThread):
+    """流水线阶段基类"""
+
+    error = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        """初始化流水线阶段"""
+        super().__init__(parent)
+        self._running = False
+
+    def start(self):
+        """启动阶段线程"""
+        self._running = True
+        super().start()
+
+    def stop(self):
+        """请求停止阶段线程"""
+        self._running = False
+
+    def is_running(self):
+        """阶段是否仍在运行"""
+        return self._running
+
+
+class CaptureStage(PipelineStage):
+    """采集阶段：读取视频帧，连同采集时刻 (time.monotonic) 放入帧队列
+
+    摄像头和网络流使用 LatestFrameQueue，只保留最新一帧；视频文件使用
+    有界队列，队列满时等待，不丢帧。网络流断开或无响应时自动重连，
+    连接状态通过 status 信号发出。
+    """
+
+    status = pyqtSignal(str)
+
+    def __init__(
+        self,
+        source,
+        output_queue,
+        is_file=False,
+        loop=True,
+        capture_size=(640, 640),
+        parent=None,
+    ):
+        """初始化采集阶段，capture_size为摄像头采集分辨率 (宽, 高)"""
+        super().__init__(parent)
+        self.source = source
+        self.output_queue = output_queue
+        self.is_file = is_file
+        # 循环播放时读到末尾从头开始，否则发送结束标记
+        self.loop = loop
+        self.frame_total = 0
+        self.capture_size = capture_size
+        # 运行中修改的采集分辨率，由采集线程在下一帧前应用
+        self.pending_capture_size = None
+
+    def open_capture(self):
+        """打开视频源"""
+        cap = cv2.VideoCapture(self.source)
+        if not self.is_file:
+            self.apply_capture_size(cap, self.capture_size)
+            # 设置摄像头缓冲区大小
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def apply_capture_size(self, cap, size):
+        """设置摄像头分辨率"""
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+        self.capture_size = size
+
+    def set_capture_size(self, size):
+        """请求修改摄像头分辨率，不需要重新打开摄像头"""
+        if not self.is_file and tuple(size) != tuple(self.capture_size):
+            self.pending_capture_size = tuple(size)
+
+    def run_stream(self):
+        """网络流采集：断开或无响应时按指数退避重连，不发出错误信号"""
+        stream = ReconnectingStream(
+            self.source, lambda: not self.is_running(), status=self.status.emit
+        )
+        try:
+            while self.is_running():
+                frame = stream.read()
+                if frame is None:
+                    break
+                item = (frame, time.monotonic())
+                if not put_until_stopped(self.output_queue, item, self):
+                    break
+        finally:
+            stream.release()
+
+    def run(self):
+        """采集线程主循环"""
+        if is_stream_url(self.source):
+            self.run_stream()
+            return
+        cap = self.open_capture()
+        if not cap.isOpened():
+            if self.is_file:
+                self.error.emit("无法打开视频文件")
+            else:
+                self.error.emit("摄像头无法打开或不可用")
+            cap.release()
+            return
+        if self.is_file:
+            self.frame_total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        try:
+            while self.is_running():
+                size, self.pending_capture_size = self.pending_capture_size, None
+                if size is not None:
+                    self.apply_capture_size(cap, size)
+                with stage_metrics.measure("capture"):
+                    ret, frame = cap.read()
+                if not ret and self.loop:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ret, frame = cap.read()
+                if not ret:
+                    if self.loop:
+                        self.error.emit("视频播放完毕或无法读取帧")
+                    else:
+                        put_until_stopped(self.output_queue, END_OF_STREAM, self)
+                    break
+                item = (frame, time.monotonic())
+                if not put_until_stopped(self.output_queue, item, self):
+                    break
+        finally:
+            cap.release()
+
+
+class InferenceStage(PipelineStage):
+    """推理阶段：对帧执行目标检测"""
+
+    finished = pyqtSignal(int, float)
+
+    def __init__(
+        self,
+        detector,
+        input_queue,
+        output_queue,
+        batch_size=1,
+        scheduler=None,
+        parent=None,
+    ):
+        """初始化推理阶段"""
+        super().__init__(parent)
+        self.detector = detector
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.batch_size = max(1, batch_size)
+        self.scheduler = scheduler or InferenceScheduler()
+        self.last_detections = None
+        self.detecting = False
+        self.frames_processed = 0
+        # 处理一批帧期间持有，更换检测器时据此等待旧检测器不再被使用
+        self._lock = threading.Lock()
+
+    def set_detector(self, detector):
+        """更换检测器，等正在处理的一批帧完成后返回被替换的检测器"""
+        old_detector = self.detector
+        self.detector = detector
+        with self._lock:
+            self.last_detections = None
+        return old_detector
+
+    def collect_frames(self):
+        """收集一批帧，返回 [(帧, 采集时刻), ...] 以及是否遇到流结束标记"""
+        items = []
+        while len(items) < self.batch_size:
+            item = get_until_stopped(self.input_queue, self)
+            if item is None:
+                break
+            if item is END_OF_STREAM:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def process(self, frames):
+        """处理一批帧，返回每帧的结果"""
+        detector = self.detector
+        if not self.detecting or detector is None:
+            return [
+                {"frame": frame, "detected": False, "total": 0, "counts": None}
+                for frame in frames
+            ]
+        # 由调度器决定哪些帧需要推理，其余帧沿用最近一次的检测结果
+        decisions = [
+            self.scheduler.should_infer(
+                frame, force=index == 0 and self.last_detections is None
+            )
+            for index, frame in enumerate(frames)
+        ]
+        infer_frames = [frame for frame, infer in zip(frames, decisions) if infer]
+        inferred = iter([])
+        if infer_frames:
+            start_time = time.perf_counter()
+            inferred = iter(detector.predict_batch(infer_frames))
+            self.scheduler.record_inference(time.perf_counter() - start_time)
+        results = []
+        for frame, infer in zip(frames, decisions):
+            if infer:
+                self.last_detections = next(inferred)
+            with stage_metrics.measure("draw"):
+                counts = detector.draw_detection(frame, self.last_detections)
+            # 实时模式与离线模式使用相同的逐帧记录方式
+            detector.save_to_csv(counts)
+            results.append(
+                {
+                    "frame": frame,
+                    "detected": True,
+                    "inferred": infer,
+                    "total": detector.total_objects,
+                    "counts": counts,
+                    "names": detector.model.names,
+                }
+            )
+        return results
+
+    def run(self):
+        """推理线程主循环"""
+        start_time = time.perf_counter()
+        while self.is_running():
+            items, end_of_stream = self.collect_frames()
+            if items:
+                try:
+                    with self._lock:
+                        results = self.process([frame for frame, _ in items])
+                except Exception as e:
+                    self.error.emit(f"检测失败: {e}")
+                    break
+                for result, (_, captured_at) in zip(results, items):
+                    self.frames_processed += 1
+                    result["frame_index"] = self.frames_processed
+                    result["captured_at"] = captured_at
+                    if not put_until_stopped(self.output_queue, result, self):
+                        return
+            if end_of_stream:
+                self.finished.emit(
+                    self.frames_processed, time.perf_counter() - start_time
+                )
+                break
+            if not items:
+                break
+
+
+class MultiStreamInferenceStage(PipelineStage):
+    """多路推理阶段：收集每路视频流的最新帧，合并为一次推理调用
+
+    所有视频流共享同一个检测器的模型，每路视频流由 share_model 创建的
+    检测器分别计数和保存结果。多路模式不使用跳帧调度和运动门控。
+    """
+
+    def __init__(self, detector, input_queues, output_queue, names, parent=None):
+        """初始化多路推理阶段，names为各路视频流的名称 (用作结果文件前缀)"""
+        super().__init__(parent)
+        self.input_queues = input_queues
+        self.output_queue = output_queue
+        self.names = names
+        self.detecting = False
+        self.frames_processed = 0
+        self.state = (None, [])
+        # 处理一批帧期间持有，更换检测器时据此等待旧检测器不再被使用
+        self._lock = threading.Lock()
+        self.set_detector(detector)
+
+    def set_detector(self, detector):
+        """更换检测器并为每路视频流创建共享模型的检测器
+
+        等正在处理的一批帧完成后返回被替换的 (检测器, 各路检测器)。
+        """
+        streams = []
+        if detector is not None:
+            streams = [detector.share_model(name) for name in self.names]
+        old_state = self.state
+        # 推理线程每批只读取一次，整体替换保证检测器与各路检测器一致
+        self.state = (detector, streams)
+        with self._lock:
+            return old_state
+
+    def latest_frames(self):
+        """取出每路的最新帧，返回 [(视频流序号, 帧, 采集时刻), ...]
+
+        没有新帧的视频流不参与本次推理。
+        """
+        batch = []
+        for index, frame_queue in enumerate(self.input_queues):
+            try:
+                frame, captured_at = frame_queue.get_nowait()
+            except queue.Empty:
+                continue
+            batch.append((index, frame, captured_at))
+        return batch
+
+    def process(self, batch):
+        """对各路视频流的最新帧执行一次推理，按视频流拆分结果"""
+        detector, streams = self.state
+        if not self.detecting or detector is None:
+            return [
+                {
+                    "stream": index,
+                    "frame": frame,
+                    "detected": False,
+                    "total": 0,
+                    "counts": None,
+                    "captured_at": captured_at,
+                }
+                for index, frame, captured_at in batch
+            ]
+        detections_list = detector.predict_batch(
+            [frame for _, frame, _ in batch], gated=False
+        )
+        results = []
+        for (index, frame, captured_at), detections in zip(batch, detections_list):
+            stream = streams[index]
+            stream.copy_settings(detector)
+            with stage_metrics.measure("draw"):
+                counts = stream.draw_detection(frame, detections)
+            stream.save_to_csv(counts)
+            results.append(
+                {
+                    "stream": index,
+                    "frame": frame,
+                    "detected": True,
+                    "inferred": True,
+                    "total": stream.total_objects,
+                    "counts": counts,
+                    "names": detector.model.names,
+                    "captured_at": captured_at,
+                }
+            )
+        return results
+
+    def run(self):
+        """推理线程主循环"""
+        while self.is_running():
+            batch = self.latest_frames()
+            if not batch:
+                time.sleep(STREAM_POLL_INTERVAL)
+                continue
+            try:
+                with self._lock:
+                    results = self.process(batch)
+            except Exception as e:
+                self.error.emit(f"检测失败: {e}")
+                break
+            for result in results:
+                self.frames_processed += 1
+                result["frame_index"] = self.frames_processed
+                if not put_until_stopped(self.output_queue, result, self):
+                    return
+
+
+class RenderStage(PipelineStage):
+    """渲染阶段：将检测结果转换为可显示的QImage
+
+    每路视频流 (结果中的 "stream"，单路时为0) 只保留最新的渲染结果。
+    帧直接缩放到显示区域的尺寸并写入复用的缓冲区；display_enabled为False
+    (窗口隐藏或最小化) 时不转换画面，结果的 "image" 为None，计数照常更新。
+
+    缓冲区只在没有QImage引用时复用：被更新结果替换、GUI未取走的结果立即
+    归还缓冲区；GUI取走的结果在显示 (QPixmap.fromImage 复制) 后调用
+    release 归还，未归还的缓冲区不会被再次写入。
+    """
+
+    frame_ready = pyqtSignal()
+
+    def __init__(self, input_queue, parent=None):
+        """初始化渲染阶段"""
+        super().__init__(parent)
+        self.input_queue = input_queue
+        self.target_size = None
+        self.display_enabled = True
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._free_buffers = {}
+
+    def acquire_buffer(self, stream, size):
+        """取出一路视频流空闲的显示缓冲区，没有尺寸相符的空闲缓冲区时分配"""
+        shape = (size[1], size[0], 3)
+        with self._lock:
+            free = self._free_buffers.get(stream, [])
+            while free:
+                buffer = free.pop()
+                if buffer.shape == shape:
+                    return buffer
+        return np.empty(shape, dtype=np.uint8)
+
+    def _recycle(self, result):
+        """归还结果占用的显示缓冲区，调用时需持有 _lock"""
+        buffer = result.pop("buffer", None)
+        if buffer is None:
+            return
+        free = self._free_buffers.setdefault(result.get("stream", 0), [])
+        if len(free) < DISPLAY_BUFFERS:
+            free.append(buffer)
+
+    def convert(self, frame, result):
+        """把一帧缩放到显示尺寸并转换为QImage，写入result的 "image"
+
+        缩放时占用的缓冲区记录在result的 "buffer" 中，用 release 归还。
+        """
+        h, w = frame.shape[:2]
+        size = fit_size(w, h, self.target_size)
+        buffer = None
+        if size != (w, h):
+            buffer = self.acquire_buffer(result.get("stream", 0), size)
+        result["image"], result["image_data"] = frame_to_qimage(frame, size, buffer)
+        result["buffer"] = buffer
+
+    def release(self, result):
+        """GUI显示完取走的结果后归还其显示缓冲区，之后不能再使用其QImage"""
+        result["image"] = None
+        result.pop("image_data", None)
+        with self._lock:
+            self._recycle(result)
+
+    def take_latest(self, stream=0):
+        """取出一路视频流最新的渲染结果，没有新结果时返回None"""
+        with self._lock:
+            return self._latest.pop(stream, None)
+
+    def take_all(self):
+        """取出各路视频流最新的渲染结果 {视频流序号: 结果}"""
+        with self._lock:
+            latest, self._latest = self._latest, {}
+        return latest
+
+    def run(self):
+        """渲染线程主循环"""
+        while self.is_running():
+            result = get_until_stopped(self.input_queue, self)
+            if result is None:
+                break
+            frame = result.pop("frame")
+            result["image"] = None
+            if self.display_enabled:
+                with stage_metrics.measure("qt_convert"):
+                    self.convert(frame, result)
+            with self._lock:
+                # GUI尚未取走上一帧时只保留最新一帧，避免事件队列堆积
+                pending = bool(self._latest)
+                replaced = self._latest.get(result.get("stream", 0))
+                if replaced is not None:
+                    self._recycle(replaced)
+                self._latest[result.get("stream", 0)] = result
+            if not pending:
+                self.frame_ready.emit()
+
+
+class DetectionPipeline(QObject):
+    """检测流水线：采集、推理、渲染三个阶段通过有界队列连接"""
+
+    frame_ready = pyqtSignal()
+    error = pyqtSignal(str)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(int, float)
+
+    def __init__(
+        self,
+        source,
+        detector,
+        is_file=False,
+        offline=False,
+        batch_size=1,
+        scheduler=None,
+        capture_size=(640, 640),
+        parent=None,
+    ):
+        """初始化检测流水线
+
+        offline为True时视频文件只处理一遍，解码超前进行，并按batch_size
+        将多帧合并为一次推理调用。scheduler为推理调度器，用于跳帧。
+        capture_size为摄像头采集分辨率 (宽, 高)。source可以是摄像头编号、
+        视频文件路径或网络流地址 (rtsp://、http:// 等)。
+        """
+        super().__init__(parent)
+        self.source = source
+        self.is_file = is_file
+        self.offline = offline
+        if not offline:
+            batch_size = 1
+        frame_queue_size = max(QUEUE_SIZE, batch_size * DECODE_AHEAD_BATCHES)
+        if is_file:
+            self.frame_queue = queue.Queue(maxsize=frame_queue_size)
+        else:
+            self.frame_queue = LatestFrameQueue()
+        self.result_queue = queue.Queue(maxsize=frame_queue_size)
+        self.capture_stage = CaptureStage(
+            source,
+            self.frame_queue,
+            is_file,
+            loop=not offline,
+            capture_size=capture_size,
+        )
+        self.inference_stage = InferenceStage(
+            detector, self.frame_queue, self.result_queue, batch_size, scheduler
+        )
+        self.inference_stage.finished.connect(self.finished)
+        self.scheduler = self.inference_stage.scheduler
+        self.render_stage = RenderStage(self.result_queue)
+        self.stages = [self.capture_stage, self.inference_stage, self.render_stage]
+        for stage in self.stages:
+            stage.error.connect(self.error)
+        self.capture_stage.status.connect(self.status)
+        self.render_stage.frame_ready.connect(self.frame_ready)
+
+    def start(self):
+        """启动所有阶段"""
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        """停止所有阶段并等待线程结束
+
+        网络流的读取可能阻塞到超时，不在GUI线程中等待采集线程。
+        """
+        for stage in self.stages:
+            stage.stop()
+        for stage in self.stages:
+            if stage is self.capture_stage and is_stream_url(self.source):
+                detach_stage(stage)
+            else:
+                stage.wait()
+
+    def set_detecting(self, detecting):
+        """设置是否执行检测"""
+        self.inference_stage.detecting = detecting
+
+    def set_detector(self, detector):
+        """更换检测器，返回被替换的检测器
+
+        返回时推理线程已不再使用旧检测器，调用方可以安全地关闭它。
+        """
+        return self.inference_stage.set_detector(detector)
+
+    def set_capture_size(self, size):
+        """修改摄像头采集分辨率"""
+        self.capture_stage.set_capture_size(size)
+
+    def set_target_size(self, width, height):
+        """设置渲染输出尺寸"""
+        self.render_stage.target_size = (width, height)
+
+    def set_display_enabled(self, enabled):
+        """设置是否转换画面，窗口隐藏或最小化时关闭"""
+        self.render_stage.display_enabled = enabled
+
+    def take_latest(self):
+        """取出最新的渲染结果"""
+        return self.render_stage.take_latest()
+
+    def release(self, result):
+        """显示完取走的结果后归还其显示缓冲区"""
+        self.render_stage.release(result)
+
+    def dropped_frames(self):
+        """摄像头因推理跟不上而丢弃的帧数"""
+        return getattr(self.frame_queue, "dropped", 0)
+
+    def progress(self):
+        """视频文件的处理进度百分比，总帧数未知时为0"""
+        frame_total = self.capture_stage.frame_total
+        if frame_total <= 0:
+            return 0
+        return min(100, self.inference_stage.frames_processed * 100 // frame_total)
+
+
+class MultiCameraPipeline(QObject):
+    """多路摄像头流水线：每路摄像头一个采集线程，共享一个推理线程和渲染线程
+
+    推理线程每次收集各路摄像头的最新帧合并推理，增加摄像头只增加
+    采集和绘制的开销。接口与 DetectionPipeline 一致，供主窗口统一管理。
+    """
+
+    frame_ready = pyqtSignal()
+    error = pyqtSignal(str)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(int, float)
+
+    def __init__(self, sources, detector, capture_size=(640, 640), parent=None):
+        """初始化多路流水线，sources为摄像头编号列表"""
+        super().__init__(parent)
+        self.sources = list(sources)
+        self.offline = False
+        self.scheduler = InferenceScheduler()
+        self.frame_queues = [LatestFrameQueue() for _ in self.sources]
+        self.result_queue = queue.Queue(maxsize=QUEUE_SIZE * len(self.sources))
+        self.capture_stages = [
+            CaptureStage(source, frame_queue, capture_size=capture_size)
+            for source, frame_queue in zip(self.sources, self.frame_queues)
+        ]
+        self.inference_stage = MultiStreamInferenceStage(
+            detector,
+            self.frame_queues,
+            self.result_queue,
+            [f"camera{source}" for source in self.sources],
+        )
+        self.render_stage = RenderStage(self.result_queue)
+        self.stages = self.capture_stages + [self.inference_stage, self.render_stage]
+        for source, stage in zip(self.sources, self.capture_stages):
+            # 单路摄像头出错时其余摄像头继续运行
+            stage.error.connect(
+                lambda message, source=source: self.error.emit(
+                    f"摄像头 {source}: {message}"
+                )
+            )
+        self.inference_stage.error.connect(self.error)
+        self.render_stage.error.connect(self.error)
+        self.render_stage.frame_ready.connect(self.frame_ready)
+
+    def start(self):
+        """启动所有阶段"""
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        """停止所有阶段，等待线程结束后写完各路视频流的结果文件"""
+        for stage in self.stages:
+            stage.stop()
+        for stage in self.stages:
+            stage.wait()
+        _, streams = self.inference_stage.set_detector(None)
+        for stream in streams:
+            stream.close()
+
+    def set_detecting(self, detecting):
+        """设置是否执行检测"""
+        self.inference_stage.detecting = detecting
+
+    def set_detector(self, detector):
+        """更换检测器，返回被替换的检测器
+
+        推理线程不再使用旧的各路检测器后，写完它们的结果并关闭。
+        """
+        old_detector, streams = self.inference_stage.set_detector(detector)
+        for stream in streams:
+            stream.close()
+        return old_detector
+
+    def set_capture_size(self, size):
+        """修改各路摄像头的采集分辨率"""
+        for stage in self.capture_stages:
+            stage.set_capture_size(size)
+
+    def set_target_size(self, width, height):
+        """设置每路画面的渲染输出尺寸"""
+        self.render_stage.target_size = (width, height)
+
+    def set_display_enabled(self, enabled):
+        """设置是否转换画面，窗口隐藏或最小化时关闭"""
+        self.render_stage.display_enabled = enabled
+
+    def take_latest(self):
+        """取出第一路摄像头最新的渲染结果"""
+        return self.render_stage.take_latest()
+
+    def take_all(self):
+        """取出各路摄像头最新的渲染结果 {序号: 结果}"""
+        return self.render_stage.take_all()
+
+    def release(self, result):
+        """显示完取走的结果后归还其显示缓冲区"""
+        self.render_stage.release(result)
+
+    def dropped_frames(self):
+        """各路摄像头因推理跟不上而丢弃的帧数之和"""
+        return sum(frame_queue.dropped for frame_queue in self.frame_queues)
+
+    def stream_detectors(self):
+        """各路摄像头的检测器，检测器未加载时为空列表"""
+        return self.inference_stage.state[1]
+
+    def progress(self):
+        """实时摄像头没有处理进度"""
+        return 0
@@ -0,0 +1,370 @@
+"""
+INT8量化模块 - 用自己的画面校准并生成INT8模型，与FP32模型对比计数和延迟
+Creater Tz2H
+
+用法示例:
+    python -m bird_detector_app.quantize --calib frames_dir videos/day1.mp4
+    python -m bird_detector_app.quantize --calib frames_dir --eval held_out.mp4
+
+校准集从视频或图片目录中均匀抽帧；--eval 指定的视频不应包含在校准集中。
+量化结果缓存在模型旁 (yolo11m_int8.onnx、yolo11m_int8_openvino_model/)，
+在 config.txt 中设置 precision=int8 后由检测器加载。
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+from utils.config_manager import PROFILES, get_profile, load_initial_config
+
+from bird_detector_app.backends import BACKENDS, letterbox
+from bird_detector_app.benchmark import percentile_summary
+from bird_detector_app.export import (
+    BACKEND_FORMATS,
+    EXPORT_FORMATS,
+    export_model,
+    exported_path,
+    is_up_to_date,
+)
+from bird_detector_app.runner import count_frames, create_detector, iter_frames
+
+# 默认校准帧数，ultralytics建议INT8校准至少使用300张图片
+DEFAULT_CALIBRATION_FRAMES = 300
+# 对比报告中每个模型的预热帧数，不计入延迟统计
+REPORT_WARMUP = 5
+# ONNX节点名中的模块序号，如 /model.23/cv2.0/cv2.0.0/conv/Conv
+MODULE_PATTERN = re.compile(r"^/model\.(\d+)/")
+
+
+def iter_calibration_frames(sources, count=DEFAULT_CALIBRATION_FRAMES):
+    """从视频或图片来源中均匀抽取最多count帧，逐帧生成以节省内存"""
+    total = sum(count_frames(source) for source in sources)
+    step = max(1, total // count) if total else 1
+    frames = itertools.chain.from_iterable(iter_frames(source) for source in sources)
+    sampled = itertools.islice(itertools.islice(frames, 0, None, step), count)
+    for _, _, _, frame in sampled:
+        yield frame
+
+
+def head_nodes(model):
+    """返回检测头 (最后一个模块) 的节点名，这些节点保持FP32以减小精度损失"""
+    names = [node.name for node in model.graph.node]
+    matches = [(MODULE_PATTERN.match(name), name) for name in names]
+    modules = [(int(match.group(1)), name) for match, name in matches if match]
+    if not modules:
+        return []
+    last = max(index for index, _ in modules)
+    return [name for index, name in modules if index == last]
+
+
+def quantize_onnx(model_path, frames, imgsz=640, force=False):
+    """用ONNX Runtime静态量化生成INT8 ONNX模型，返回模型路径
+
+    先导出FP32的ONNX模型，再用校准帧统计激活值范围，
+    权重按通道量化，检测头保持FP32。
+    """
+    target = exported_path(model_path, "onnx", int8=True)
+    if not force and is_up_to_date(model_path, target):
+        print(f"已存在INT8模型: {target}")
+        return target
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+
+    fp32_path = export_model(model_path, "onnx", imgsz)
+    model = onnx.load(fp32_path)
+    input_name = model.graph.input[0].name
+
+    class FrameReader(CalibrationDataReader):
+        """逐帧提供与推理时相同预处理的校准输入"""
+
+        def __init__(self):
+            self.frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            if frame is None:
+                return None
+            image = letterbox(frame, imgsz)[0]
+            blob = cv2.dnn.blobFromImage(image, 1 / 255.0, swapRB=True)
+            return {input_name: blob}
+
+    quantize_static(
+        fp32_path,
+        target,
+        FrameReader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        nodes_to_exclude=head_nodes(model),
+    )
+    # 量化不保留ultralytics写入的元数据 (类别名称、输入尺寸)，从FP32模型复制
+    quantized = onnx.load(target)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, target)
+    print(f"INT8模型已保存到: {target}")
+    return target
+
+
+def quantize_openvino(model_path, frames, imgsz=640, force=False):
+    """用ultralytics (NNCF) 生成INT8 OpenVINO模型，返回模型目录
+
+    校准帧先写入模型旁的 <模型名>_calibration 目录，并生成数据集描述文件。
+    """
+    target = exported_path(model_path, "openvino", int8=True)
+    if not force and is_up_to_date(model_path, target):
+        print(f"已存在INT8模型: {target}")
+        return target
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+    calibration_dir = os.path.splitext(model_path)[0] + "_calibration"
+    images_dir = os.path.join(calibration_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+    for index, frame in enumerate(frames):
+        cv2.imwrite(os.path.join(images_dir, f"{index:06d}.jpg"), frame)
+    data_path = os.path.join(calibration_dir, "calibration.yaml")
+    with open(data_path, "w", encoding="utf-8") as f:
+        # JSON是YAML的子集，类别名称中的特殊字符无需额外转义
+        json.dump(
+            {
+                "path": os.path.abspath(calibration_dir),
+                "train": "images",
+                "val": "images",
+                "names": model.names,
+            },
+            f,
+            ensure_ascii=False,
+        )
+    output = model.export(
+        format="openvino", int8=True, data=data_path, imgsz=imgsz, dynamic=True
+    )
+    print(f"INT8模型已保存到: {output}")
+    return str(output)
+
+
+QUANTIZERS = {"onnx": quantize_onnx, "openvino": quantize_openvino}
+
+
+def compare_models(baseline, quantized, clip, warmup=REPORT_WARMUP):
+    """在同一视频上逐帧交替运行两个检测器，返回 (逐帧记录, 汇总)
+
+    交替运行使两个模型处在相同的温度和负载条件下，适合无风扇设备。
+    计数只统计检测器的识别类别。
+    """
+    rows = []
+    latencies = {"fp32": [], "int8": []}
+    class_totals = {"fp32": {}, "int8": {}}
+    for _, frame_index, _, frame in iter_frames(clip):
+        row = {"帧号": frame_index}
+        for label, detector in (("fp32", baseline), ("int8", quantized)):
+            start = time.perf_counter()
+            counts = detector.process_batch([frame], draw=False)[0][1]
+            elapsed = time.perf_counter() - start
+            if frame_index >= warmup:
+                latencies[label].append(elapsed)
+            row[f"{label}数量"] = int(counts.sum())
+            row[f"{label}延迟(ms)"] = round(elapsed * 1000, 3)
+            totals = class_totals[label]
+            for name, count in detector.counts_to_dict(counts).items():
+                totals[name] = totals.get(name, 0) + count
+        row["差值"] = row["int8数量"] - row["fp32数量"]
+        rows.append(row)
+    if not rows:
+        raise RuntimeError(f"无法读取对比视频: {clip}")
+
+    fp32_counts = np.array([row["fp32数量"] for row in rows])
+    int8_counts = np.array([row["int8数量"] for row in rows])
+    difference = int8_counts - fp32_counts
+    models = {}
+    for label, counts in (("fp32", fp32_counts), ("int8", int8_counts)):
+        models[label] = {
+            "total_count": int(counts.sum()),
+            "mean_count": round(float(counts.mean()), 3),
+            "class_totals": class_totals[label],
+            "latency": percentile_summary(latencies[label]),
+        }
+    fp32_mean = models["fp32"]["latency"].get("mean_ms")
+    int8_mean = models["int8"]["latency"].get("mean_ms")
+    summary = {
+        "frames": len(rows),
+        "models": models,
+        "count_mae": round(float(np.abs(difference).mean()), 3),
+        "count_bias": round(float(difference.mean()), 3),
+        "exact_match_ratio": round(float((difference == 0).mean()), 4),
+        "total_count_change": (
+            round(float(int8_counts.sum() / fp32_counts.sum() - 1), 4)
+            if fp32_counts.sum()
+            else None
+        ),
+        "speedup": (
+            round(fp32_mean / int8_mean, 3) if fp32_mean and int8_mean else None
+        ),
+    }
+    return rows, summary
+
+
+def write_report(rows, summary, output):
+    """写入汇总JSON和同名的逐帧CSV，返回CSV路径"""
+    output_dir = os.path.dirname(output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    csv_path = os.path.splitext(output)[0] + ".csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return csv_path
+
+
+def print_summary(summary):
+    """在终端打印对比结果"""
+    print(f"对比帧数: {summary['frames']}", file=sys.stderr)
+    for label, model in summary["models"].items():
+        latency = model["latency"]
+        print(
+            f"  {label}: 总数量 {model['total_count']}, "
+            f"平均每帧 {model['mean_count']}, "
+            f"延迟 p50 {latency.get('p50_ms')} ms / p90 {latency.get('p90_ms')} ms",
+            file=sys.stderr,
+        )
+    print(
+        f"  每帧数量平均绝对误差 {summary['count_mae']}, "
+        f"数量完全一致的帧 {summary['exact_match_ratio']:.1%}, "
+        f"加速比 {summary['speedup']}",
+        file=sys.stderr,
+    )
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    config = load_initial_config()
+    parser = argparse.ArgumentParser(
+        prog="python -m bird_detector_app.quantize",
+        description="用校准帧生成INT8量化模型，并在保留视频上与FP32模型对比",
+    )
+    parser.add_argument(
+        "-m", "--model", default=config["model_path"], help="YOLO模型路径 (.pt)"
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=EXPORT_FORMATS,
+        default=BACKEND_FORMATS.get(config["backend"], "onnx"),
+        help="量化模型格式，对应onnxruntime或openvino后端",
+    )
+    parser.add_argument("--calib", nargs="*", default=[], help="校准用的视频或图片目录")
+    parser.add_argument(
+        "--calib-frames",
+        type=int,
+        default=DEFAULT_CALIBRATION_FRAMES,
+        help="校准帧数",
+    )
+    parser.add_argument("--imgsz", type=int, default=640, help="量化时的输入尺寸")
+    parser.add_argument("--force", action="store_true", help="已有INT8模型时也重新量化")
+    parser.add_argument("--eval", help="对比用的保留视频，不应包含在校准集中")
+    parser.add_argument(
+        "--baseline-backend",
+        choices=BACKENDS,
+        default=config["backend"],
+        help="FP32对照模型使用的推理后端",
+    )
+    parser.add_argument(
+        "-c",
+        "--classes",
+        default=",".join(sorted(config["selected_classes"])) or "bird",
+        help="对比时统计的类别，逗号分隔",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=config["profile"],
+        help="对比时两个模型共用的性能配置",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="对比报告JSON路径，默认 results/quant_report_<时间>.json，"
+        "逐帧结果写入同名CSV",
+    )
+    args = parser.parse_args(argv)
+    if not args.calib and not args.eval:
+        parser.error("需要指定 --calib 生成INT8模型，或 --eval 对比已有模型")
+    if args.eval and os.path.abspath(args.eval) in map(os.path.abspath, args.calib):
+        parser.error("对比视频不应同时用于校准")
+    if args.output is None:
+        args.output = os.path.join(
+            "results", f"quant_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+    args.threads = config["threads"]
+    args.profile = get_profile(args.profile, config["profile_overrides"])
+    return args
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = parse_args(argv)
+    if not os.path.exists(args.model):
+        print(f"模型文件不存在: {args.model}", file=sys.stderr)
+        return 1
+    if args.calib:
+        frames = iter_calibration_frames(args.calib, args.calib_frames)
+        QUANTIZERS[args.format](args.model, frames, args.imgsz, args.force)
+    if args.eval:
+        classes = {c for c in args.classes.split(",") if c}
+        backend = next(b for b, f in BACKEND_FORMATS.items() if f == args.format)
+        baseline = create_detector(
+            args.model,
+            classes,
+            profile=args.profile,
+            backend=args.baseline_backend,
+            threads=args.threads,
+        )
+        # 没有INT8模型时create_backend抛出异常，避免把FP32模型当作INT8对比
+        try:
+            quantized = create_detector(
+                args.model,
+                classes,
+                profile=args.profile,
+                backend=backend,
+                threads=args.threads,
+                precision="int8",
+            )
+        except (FileNotFoundError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        rows, summary = compare_models(baseline, quantized, args.eval)
+        summary["config"] = {
+            "model": args.model,
+            "clip": args.eval,
+            "classes": sorted(baseline.selected_classes),
+            "baseline": type(baseline.model).__name__,
+            "baseline_path": baseline.model.model_path,
+            "int8": type(quantized.model).__name__,
+            "int8_path": quantized.model.model_path,
+            "threads": args.threads,
+        }
+        csv_path = write_report(rows, summary, args.output)
+        print_summary(summary)
+        print(f"对比报告已保存到: {args.output}, {csv_path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
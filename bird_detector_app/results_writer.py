@@ -0,0 +1,386 @@
+"""
+结果写入模块 - 在后台线程中缓冲写入逐帧计数，按大小或小时切分文件
+Creater Tz2H
+
+每帧一行：时间戳、总数量和各类别数量。调用方只把记录放入队列，
+文件写入、刷新和切分都在写入线程中完成，不会阻塞视频处理。
+结果可保存为CSV，或保存为Parquet列式文件 (需要pyarrow)；读取时只加载
+需要的类别列和时间范围。
+"""
+
+import csv
+import importlib.util
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# 缓冲行数达到该值时写入文件
+FLUSH_ROWS = 500
+# 距上次写入超过该秒数时写入文件
+FLUSH_INTERVAL = 2.0
+# 单个文件超过该大小 (字节) 时切换到新文件
+ROTATE_BYTES = 50 * 1024 * 1024
+# 队列容量，写入线程跟不上时丢弃新记录而不是阻塞调用方
+QUEUE_SIZE = 10000
+# sync() 等待写入线程的最长秒数，超时后不再等待，避免阻塞界面
+SYNC_TIMEOUT = 5.0
+# Parquet文件每个行组的行数
+ROW_GROUP_ROWS = 10000
+# 每个结果文件都有的列，其余列为各类别数量
+BASE_COLUMNS = ("时间戳", "总数量")
+
+# 队列中的控制消息
+_STOP = object()
+
+
+def format_timestamp(timestamp):
+    """时间戳格式化为字符串，保留到毫秒"""
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+class CsvSink:
+    """CSV结果文件，表头为 时间戳, 总数量, 各类别"""
+
+    extension = ".csv"
+    # 每次写入后都刷新到磁盘，写入过程中即可读取
+    readable_while_open = True
+
+    def __init__(self, path, classes):
+        """创建文件并写入表头"""
+        self.path = path
+        self.classes = list(classes)
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(list(BASE_COLUMNS) + self.classes)
+
+    def write_rows(self, rows):
+        """写入多行 [(时间戳, 总数量, {类别: 数量}), ...]"""
+        self.writer.writerows(
+            [format_timestamp(timestamp), total]
+            + [counts.get(cls, 0) for cls in self.classes]
+            for timestamp, total, counts in rows
+        )
+        self.file.flush()
+
+    def size(self):
+        """当前文件大小 (字节)"""
+        return self.file.tell()
+
+    def close(self):
+        """关闭文件"""
+        self.file.close()
+
+
+class ParquetSink:
+    """Parquet结果文件
+
+    时间戳为毫秒精度的timestamp列，总数量和各类别数量为int32列。
+    每满 row_group_rows 行写入一个行组，关闭时写入剩余行和文件尾。
+    """
+
+    extension = ".parquet"
+    # 关闭时才写入文件尾，关闭前无法读取
+    readable_while_open = False
+
+    def __init__(self, path, classes, row_group_rows=ROW_GROUP_ROWS):
+        """创建Parquet文件"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.path = path
+        self.classes = list(classes)
+        self.row_group_rows = row_group_rows
+        self.schema = pa.schema(
+            [(BASE_COLUMNS[0], pa.timestamp("ms")), (BASE_COLUMNS[1], pa.int32())]
+            + [(cls, pa.int32()) for cls in self.classes]
+        )
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self.pending = []
+
+    def write_rows(self, rows):
+        """缓存多行，满一个行组时写入文件"""
+        self.pending.extend(rows)
+        if len(self.pending) >= self.row_group_rows:
+            self.write_row_group()
+
+    def write_row_group(self):
+        """把缓存的行写为一个行组"""
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        columns = [
+            [datetime.fromtimestamp(timestamp) for timestamp, _, _ in rows],
+            [total for _, total, _ in rows],
+        ] + [[counts.get(cls, 0) for _, _, counts in rows] for cls in self.classes]
+        arrays = [
+            self.pa.array(column, type=field.type)
+            for column, field in zip(columns, self.schema)
+        ]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def size(self):
+        """已写入文件的大小 (字节)"""
+        return os.path.getsize(self.path)
+
+    def close(self):
+        """写入剩余行并关闭文件"""
+        self.write_row_group()
+        self.writer.close()
+
+
+SINK_CLASSES = {"csv": CsvSink, "parquet": ParquetSink}
+
+
+def get_sink_class(results_format):
+    """根据结果格式名称返回写入类，未安装pyarrow时退回CSV"""
+    sink_class = SINK_CLASSES.get(results_format)
+    if sink_class is None:
+        raise ValueError(f"不支持的结果格式: {results_format}")
+    if sink_class is ParquetSink:
+        if importlib.util.find_spec("pyarrow") is None:
+            print("未安装pyarrow，检测结果改为保存为CSV")
+            return CsvSink
+    return sink_class
+
+
+def read_results(paths, classes=None, start=None, end=None):
+    """读取结果文件，返回pandas DataFrame
+
+    classes为None时读取全部类别列，否则只读取时间戳、总数量和指定类别；
+    start/end为datetime，只保留 start <= 时间戳 < end 的行。Parquet文件
+    只读取需要的列，并按行组统计信息跳过时间范围之外的行组。
+    """
+    import pandas as pd
+
+    frames = [
+        (read_parquet if path.endswith(".parquet") else read_csv)(
+            path, classes, start, end
+        )
+        for path in paths
+    ]
+    if not frames:
+        return pd.DataFrame(columns=list(BASE_COLUMNS))
+    df = pd.concat(frames, ignore_index=True)
+    # 不同文件的类别列可能不同，缺失的数量为0
+    class_columns = [column for column in df.columns if column not in BASE_COLUMNS]
+    df[class_columns] = df[class_columns].fillna(0).astype("int32")
+    return df
+
+
+def read_csv(path, classes, start, end):
+    """读取CSV结果文件中需要的列和时间范围"""
+    import pandas as pd
+
+    usecols = None
+    if classes is not None:
+        usecols = (set(BASE_COLUMNS) | set(classes)).__contains__
+    df = pd.read_csv(path, usecols=usecols, parse_dates=[BASE_COLUMNS[0]])
+    if start is not None:
+        df = df[df[BASE_COLUMNS[0]] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df[BASE_COLUMNS[0]] < pd.Timestamp(end)]
+    return df
+
+
+def read_parquet(path, classes, start, end):
+    """读取Parquet结果文件中需要的列和时间范围"""
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    columns = None
+    if classes is not None:
+        wanted = set(BASE_COLUMNS) | set(classes)
+        columns = [name for name in pq.read_schema(path).names if name in wanted]
+    filters = []
+    if start is not None:
+        filters.append((BASE_COLUMNS[0], ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append((BASE_COLUMNS[0], "<", pd.Timestamp(end)))
+    table = pq.read_table(path, columns=columns, filters=filters or None)
+    return table.to_pandas()
+
+
+class ResultsWriter:
+    """后台结果写入器
+
+    record() 只把一帧的计数放入队列；写入线程缓冲满 flush_rows 行或
+    距上次写入超过 flush_interval 秒时写入文件，关闭时写入剩余数据。
+    文件超过 rotate_bytes 字节，或 rotate_hourly 为True且跨过整点时，
+    切换到新文件；类别变化时也会切换文件，使每个文件的列保持不变。
+    """
+
+    def __init__(
+        self,
+        results_dir,
+        prefix="object_detection",
+        sink_class=CsvSink,
+        flush_rows=FLUSH_ROWS,
+        flush_interval=FLUSH_INTERVAL,
+        rotate_bytes=ROTATE_BYTES,
+        rotate_hourly=True,
+        history=None,
+    ):
+        """初始化写入器并启动写入线程
+
+        history为可选的DetectionHistory，每批数据同时写入检测历史数据库。
+        """
+        self.results_dir = results_dir
+        self.prefix = prefix
+        self.sink_class = sink_class
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_hourly = rotate_hourly
+        self.history = history
+        self.paths = []  # 本次运行写入的全部文件，按时间顺序
+        self.rows_dropped = 0
+        self.classes = set()
+        self.closed = False
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._sink = None
+        self._sink_classes = []
+        self._sink_hour = None
+        os.makedirs(results_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def record(self, class_counts, classes=None, timestamp=None):
+        """记录一帧的各类别数量，classes为文件中需要列出的全部类别"""
+        if self.closed:
+            return
+        if classes is not None and classes != self.classes:
+            self.classes = set(classes)
+        timestamp = time.time() if timestamp is None else timestamp
+        row = (timestamp, sum(class_counts.values()), dict(class_counts))
+        try:
+            self._queue.put_nowait((row, self.classes))
+        except queue.Full:
+            self.rows_dropped += 1
+
+    def sync(self, timeout=SYNC_TIMEOUT):
+        """等待已记录的数据全部写入，之后可以读取 paths 中的全部文件
+
+        写入过程中无法读取的格式 (Parquet) 会关闭当前文件，后续数据写入新文件。
+        队列已满或写入线程在 timeout 秒内没有处理完时返回False，此时只有
+        部分数据已写入；否则返回True。
+        """
+        if self.closed:
+            return True
+        deadline = time.monotonic() + timeout
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(max(0.0, deadline - time.monotonic()))
+
+    def close(self):
+        """停止写入线程，写入剩余数据并关闭文件"""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def run(self):
+        """写入线程主循环"""
+        buffer = []
+        buffer_classes = None
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            if isinstance(item, threading.Event):
+                # sync(): 写入缓冲的数据，使已有文件都可以读取
+                if buffer:
+                    self.flush(buffer, buffer_classes)
+                    buffer = []
+                last_flush = time.monotonic()
+                if self._sink is not None and not self._sink.readable_while_open:
+                    self._sink.close()
+                    self._sink = None
+                item.set()
+            elif item is not None:
+                row, classes = item
+                if classes is not buffer_classes and buffer:
+                    # 类别变化前的数据先写入旧文件
+                    self.flush(buffer, buffer_classes)
+                    buffer = []
+                buffer_classes = classes
+                buffer.append(row)
+            if len(buffer) >= self.flush_rows or (
+                time.monotonic() - last_flush >= self.flush_interval
+            ):
+                if buffer:
+                    self.flush(buffer, buffer_classes)
+                    buffer = []
+                last_flush = time.monotonic()
+        if buffer:
+            self.flush(buffer, buffer_classes)
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+        if self.history is not None:
+            self.history.close()
+
+    def flush(self, rows, classes):
+        """把缓冲的行写入文件，必要时先切换文件"""
+        classes = sorted(classes or set().union(*(counts for _, _, counts in rows)))
+        try:
+            start = 0
+            for i, (timestamp, _, _) in enumerate(rows):
+                hour = self.hour_of(timestamp)
+                if self.needs_rotation(classes, hour):
+                    if i > start:
+                        self._sink.write_rows(rows[start:i])
+                        start = i
+                    self.open_sink(classes, hour)
+            self._sink.write_rows(rows[start:])
+        except OSError as e:
+            print(f"写入检测结果失败: {e}")
+        if self.history is not None:
+            try:
+                self.history.insert(rows)
+            except sqlite3.Error as e:
+                print(f"写入检测历史失败: {e}")
+
+    def hour_of(self, timestamp):
+        """按小时切分时的时间段标识"""
+        if not self.rotate_hourly:
+            return None
+        return time.localtime(timestamp)[:4]
+
+    def needs_rotation(self, classes, hour):
+        """判断是否需要切换到新文件"""
+        return (
+            self._sink is None
+            or classes != self._sink_classes
+            or hour != self._sink_hour
+            or self._sink.size() >= self.rotate_bytes
+        )
+
+    def open_sink(self, classes, hour):
+        """关闭当前文件并创建新文件"""
+        if self._sink is not None:
+            self._sink.close()
+        name = f"{self.prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        path = os.path.join(self.results_dir, name + self.sink_class.extension)
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(
+                self.results_dir, f"{name}_{suffix}{self.sink_class.extension}"
+            )
+            suffix += 1
+        self._sink = self.sink_class(path, classes)
+        self._sink_classes = classes
+        self._sink_hour = hour
+        self.paths.append(path)
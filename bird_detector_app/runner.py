@@ -0,0 +1,234 @@
+"""
+批量检测执行模块 - 读取视频/图片来源，并在多进程中并行检测
+Creater Tz2H
+
+每个工作进程在启动时只加载一次模型，然后从共享任务队列中领取
+文件或长视频的帧区间，结果按输入顺序合并输出。
+"""
+
+import math
+import multiprocessing
+import os
+import sys
+
+import cv2
+
+from bird_detector_app.detector import ObjectDetector
+from bird_detector_app.motion import MotionGate
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+# 自动划分帧区间时每个区间的最小帧数，避免频繁定位带来的解码开销
+MIN_CHUNK_FRAMES = 500
+# 自动划分时每个工作进程平均分到的任务数，用于平衡各进程负载
+TASKS_PER_WORKER = 4
+
+# 工作进程内的检测器，由 init_worker 创建
+_worker_detector = None
+
+
+def list_images(directory):
+    """列出目录中的图片文件"""
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+def count_frames(source):
+    """获取来源的帧数，未知时返回0"""
+    if os.path.isdir(source):
+        return len(list_images(source))
+    if source.lower().endswith(IMAGE_EXTENSIONS):
+        return 1
+    cap = cv2.VideoCapture(source)
+    try:
+        return max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    finally:
+        cap.release()
+
+
+def iter_frames(source, start=0, end=None):
+    """读取来源中 [start, end) 区间的帧，生成 (文件路径, 帧号, 时间(秒), 帧)"""
+    if os.path.isdir(source):
+        images = list_images(source)[start:end]
+        for frame_index, path in enumerate(images, start):
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield path, frame_index, None, frame
+    elif source.lower().endswith(IMAGE_EXTENSIONS):
+        frame = cv2.imread(source)
+        if frame is not None:
+            yield source, 0, None, frame
+    else:
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            print(f"无法打开视频文件: {source}", file=sys.stderr)
+            return
+        try:
+            if start > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            frame_index = start
+            while end is None or frame_index < end:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield source, frame_index, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000, frame
+                frame_index += 1
+        finally:
+            cap.release()
+
+
+def create_detector(
+    model_path,
+    selected_classes,
+    motion_gate=None,
+    profile=None,
+    backend="ultralytics",
+    threads=0,
+    precision="fp32",
+):
+    """创建不写入results目录的检测器
+
+    motion_gate为 (阈值, 最小面积) 时启用运动门控；profile为性能配置参数；
+    backend、threads和precision为推理后端、线程数和模型精度。
+    """
+    detector = ObjectDetector(
+        model_path,
+        save_results=False,
+        backend=backend,
+        threads=threads,
+        precision=precision,
+    )
+    detector.selected_classes = set(selected_classes) or set(
+        detector.model.names.values()
+    )
+    if motion_gate is not None:
+        detector.motion_gate = MotionGate(*motion_gate)
+    if profile is not None:
+        detector.apply_profile(profile)
+    return detector
+
+
+def detect_frames(detector, frames, batch_size):
+    """按批检测帧序列，生成逐帧计数记录"""
+    batch = []
+
+    def flush():
+        processed = detector.process_batch([item[3] for item in batch], draw=False)
+        for (path, frame_index, seconds, _), (_, counts) in zip(batch, processed):
+            yield {
+                "来源": path,
+                "帧号": frame_index,
+                "时间": None if seconds is None else round(seconds, 3),
+                "总数量": int(counts.sum()),
+                "类别数量": detector.counts_to_dict(counts),
+            }
+        batch.clear()
+
+    for item in frames:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield from flush()
+    if batch:
+        yield from flush()
+
+
+def plan_tasks(sources, workers, chunk_frames=0):
+    """将来源划分为任务列表 [(来源, 起始帧, 结束帧), ...]
+
+    chunk_frames为0时根据总帧数和进程数自动确定区间大小；
+    帧数未知的来源作为一个整体任务。
+    """
+    frame_counts = [count_frames(source) for source in sources]
+    if chunk_frames <= 0:
+        total_frames = sum(frame_counts)
+        chunk_frames = max(
+            MIN_CHUNK_FRAMES, math.ceil(total_frames / (workers * TASKS_PER_WORKER))
+        )
+    tasks = []
+    for source, frame_count in zip(sources, frame_counts):
+        if frame_count <= 0:
+            tasks.append((source, 0, None))
+            continue
+        for start in range(0, frame_count, chunk_frames):
+            end = min(start + chunk_frames, frame_count)
+            # 最后一个区间读到文件末尾，容忍帧数统计不准确
+            tasks.append((source, start, None if end == frame_count else end))
+    return tasks
+
+
+def init_worker(
+    model_path,
+    selected_classes,
+    threads,
+    motion_gate=None,
+    profile=None,
+    backend="ultralytics",
+    precision="fp32",
+):
+    """工作进程初始化：限制线程数并加载一次模型"""
+    global _worker_detector
+    cv2.setNumThreads(threads)
+    _worker_detector = create_detector(
+        model_path,
+        selected_classes,
+        motion_gate,
+        profile,
+        backend,
+        threads,
+        precision,
+    )
+
+
+def run_task(task, batch_size):
+    """在工作进程中执行一个任务，返回该任务的全部记录"""
+    source, start, end = task
+    if _worker_detector.motion_gate is not None:
+        # 各任务的帧不连续，背景模型需要重新建立
+        _worker_detector.motion_gate.reset()
+    return list(
+        detect_frames(_worker_detector, iter_frames(source, start, end), batch_size)
+    )
+
+
+def _run_task_with_batch(args):
+    """Pool.imap 只传递一个参数，在此拆包"""
+    return run_task(*args)
+
+
+def run_parallel(
+    sources,
+    model_path,
+    selected_classes,
+    batch_size,
+    workers,
+    chunk_frames=0,
+    motion_gate=None,
+    profile=None,
+    backend="ultralytics",
+    precision="fp32",
+):
+    """使用进程池并行检测全部来源，按输入顺序生成 (来源, 记录列表)"""
+    tasks = plan_tasks(sources, workers, chunk_frames)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with multiprocessing.Pool(
+        processes=workers,
+        initializer=init_worker,
+        initargs=(
+            model_path,
+            selected_classes,
+            threads,
+            motion_gate,
+            profile,
+            backend,
+            precision,
+        ),
+    ) as pool:
+        # imap按任务顺序返回结果，任务则由空闲进程依次领取
+        results = pool.imap(
+            _run_task_with_batch, [(task, batch_size) for task in tasks], chunksize=1
+        )
+        for task, records in zip(tasks, results):
+            yield task[0], records
@@ -0,0 +1,83 @@
+"""
+推理调度模块 - 按固定间隔或画面变化决定哪些帧需要执行检测
+Creater Tz2H
+"""
+
+import cv2
+
+# 计算帧差时使用的缩略图尺寸
+DIFF_SIZE = (64, 36)
+
+
+class InferenceScheduler:
+    """自适应推理调度器
+
+    diff_threshold: 帧差阈值 (0-255 的平均灰度差)。大于0时由帧差决定：
+        与上次检测帧相比变化达到阈值才检测，否则沿用上一次的检测结果。
+    every_n: diff_threshold为0时每隔多少帧检测一次，1表示每帧都检测；
+        使用帧差时为两次检测之间的最大间隔，画面不变也会定期检测，
+        1表示不限制。
+    跳过的帧沿用最近一次检测结果，因此计数和逐帧记录不会中断。
+    """
+
+    def __init__(self, every_n=1, diff_threshold=0.0):
+        """初始化调度器"""
+        self.every_n = max(1, int(every_n))
+        self.diff_threshold = float(diff_threshold)
+        self.reference = None
+        self.frames_since_inference = 0
+        self.frames_total = 0
+        self.frames_inferred = 0
+        self.inference_seconds = 0.0
+
+    def is_active(self):
+        """调度器是否会跳过帧"""
+        return self.every_n > 1 or self.diff_threshold > 0
+
+    def frame_difference(self, thumbnail):
+        """计算缩略图与上次检测帧之间的平均灰度差"""
+        if self.reference is None:
+            return float("inf")
+        return float(cv2.absdiff(thumbnail, self.reference).mean())
+
+    def should_infer(self, frame, force=False):
+        """判断当前帧是否需要执行检测，force为True时必定检测"""
+        self.frames_total += 1
+        self.frames_since_inference += 1
+        infer = force or self.frames_inferred == 0
+        thumbnail = None
+        if self.diff_threshold > 0:
+            thumbnail = cv2.cvtColor(
+                cv2.resize(frame, DIFF_SIZE, interpolation=cv2.INTER_AREA),
+                cv2.COLOR_BGR2GRAY,
+            )
+            # 帧差为主要条件，every_n大于1时限制最长的检测间隔
+            infer = (
+                infer
+                or self.frame_difference(thumbnail) >= self.diff_threshold
+                or 1 < self.every_n <= self.frames_since_inference
+            )
+        else:
+            infer = infer or self.frames_since_inference >= self.every_n
+        if infer:
+            self.frames_inferred += 1
+            self.frames_since_inference = 0
+            self.reference = thumbnail
+        return infer
+
+    def record_inference(self, seconds):
+        """记录推理调用的耗时"""
+        self.inference_seconds += seconds
+
+    def skip_rate(self):
+        """被跳过的帧所占比例"""
+        if self.frames_total == 0:
+            return 0.0
+        return 1 - self.frames_inferred / self.frames_total
+
+    def saved_seconds(self):
+        """根据平均单帧推理耗时估算跳帧节省的推理时间（秒）"""
+        if self.frames_inferred == 0:
+            return 0.0
+        per_frame = self.inference_seconds / self.frames_inferred
+        return per_frame * (self.frames_total - self.frames_inferred)
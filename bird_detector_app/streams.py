@@ -0,0 +1,191 @@
+"""
+网络流模块 - 读取RTSP/HTTP等网络视频流，断开或无响应时自动重连
+Creater Tz2H
+
+本模块不依赖PyQt5，可在无界面环境下单独测试，例如用ffmpeg把本地视频
+作为HTTP流提供:
+    ffmpeg -re -stream_loop -1 -i clip.mp4 -f mpegts -listen 1 http://localhost:8554
+    python -m bird_detector_app.streams http://localhost:8554 --seconds 30
+"""
+
+import argparse
+import os
+import sys
+import time
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import cv2
+
+# 作为网络流打开的地址前缀
+STREAM_SCHEMES = (
+    "rtsp://",
+    "rtsps://",
+    "rtmp://",
+    "http://",
+    "https://",
+    "udp://",
+    "tcp://",
+    "srt://",
+)
+# 打开网络流以及读取一帧的超时时间（秒），超过后视为无响应并重连
+STALL_TIMEOUT = 5.0
+# 重连等待时间（秒）：从 BACKOFF_INITIAL 开始每次翻倍，最长 BACKOFF_MAX
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+# 等待重连期间检查停止请求的间隔（秒）
+STOP_POLL_INTERVAL = 0.1
+
+# RTSP默认使用TCP传输，避免UDP丢包造成花屏；可通过环境变量覆盖
+os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "rtsp_transport;tcp")
+
+
+def is_stream_url(source):
+    """来源是否为网络流地址"""
+    return isinstance(source, str) and source.lower().startswith(STREAM_SCHEMES)
+
+
+def file_url_to_path(url):
+    """把 file:// 地址转换为本地文件路径，不是 file:// 地址时返回None
+
+    本地文件按视频文件打开 (不丢帧、播放结束即停止)，不作为网络流重连。
+    """
+    if not isinstance(url, str) or not url.lower().startswith("file://"):
+        return None
+    return url2pathname(urlparse(url).path)
+
+
+def open_stream(url, timeout=STALL_TIMEOUT):
+    """用FFmpeg后端打开网络流，连接和读取都有超时，不会无限阻塞"""
+    milliseconds = int(timeout * 1000)
+    return cv2.VideoCapture(
+        url,
+        cv2.CAP_FFMPEG,
+        [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC,
+            milliseconds,
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC,
+            milliseconds,
+        ],
+    )
+
+
+class ReconnectingStream:
+    """自动重连的网络流读取器
+
+    read() 返回下一帧；连接失败、读取失败或超过 stall_timeout 秒没有
+    新帧时释放连接，按指数退避等待后重连。should_stop 为返回布尔值的
+    函数，请求停止时 read() 返回None。status 为可选的回调，接收状态文字。
+    """
+
+    def __init__(
+        self,
+        url,
+        should_stop,
+        status=None,
+        stall_timeout=STALL_TIMEOUT,
+        backoff_max=BACKOFF_MAX,
+    ):
+        """初始化读取器，第一次调用 read() 时才连接"""
+        self.url = url
+        self.should_stop = should_stop
+        self.status = status or (lambda message: None)
+        self.stall_timeout = stall_timeout
+        self.backoff_max = backoff_max
+        self.cap = None
+        self.backoff = BACKOFF_INITIAL
+        self.reconnects = 0
+        self.stalls = 0
+        self.last_frame_time = None
+
+    def read(self):
+        """读取下一帧，必要时重连，请求停止时返回None"""
+        while not self.should_stop():
+            if self.cap is None and not self.connect():
+                self.wait_backoff()
+                continue
+            ret, frame = self.cap.read()
+            now = time.monotonic()
+            if ret:
+                self.last_frame_time = now
+                self.backoff = BACKOFF_INITIAL
+                return frame
+            if now - self.last_frame_time >= self.stall_timeout:
+                self.stalls += 1
+                self.status(
+                    f"网络流超过 {self.stall_timeout:.0f} 秒没有新画面，正在重连"
+                )
+            else:
+                self.status("网络流连接中断，正在重连")
+            self.release()
+            self.reconnects += 1
+            self.wait_backoff()
+        return None
+
+    def connect(self):
+        """连接网络流，成功时返回True"""
+        self.status(f"正在连接网络流: {self.url}")
+        cap = open_stream(self.url, self.stall_timeout)
+        if not cap.isOpened():
+            cap.release()
+            return False
+        self.cap = cap
+        self.last_frame_time = time.monotonic()
+        self.status(f"已连接网络流: {self.url}")
+        return True
+
+    def wait_backoff(self):
+        """等待退避时间后再重连，等待期间可被停止请求打断"""
+        self.status(f"{self.backoff:.1f} 秒后重连网络流")
+        deadline = time.monotonic() + self.backoff
+        while not self.should_stop() and time.monotonic() < deadline:
+            time.sleep(STOP_POLL_INTERVAL)
+        self.backoff = min(self.backoff * 2, self.backoff_max)
+
+    def release(self):
+        """释放连接"""
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+def main(argv=None):
+    """命令行入口：读取网络流一段时间，输出帧率、重连和无响应次数"""
+    parser = argparse.ArgumentParser(
+        prog="python -m bird_detector_app.streams",
+        description="测试网络视频流的读取和自动重连",
+    )
+    parser.add_argument("url", help="网络流地址，如 rtsp://... 或 http://...")
+    parser.add_argument("--seconds", type=float, default=30.0, help="测试时长")
+    parser.add_argument(
+        "--stall-timeout", type=float, default=STALL_TIMEOUT, help="无响应超时（秒）"
+    )
+    args = parser.parse_args(argv)
+    if not is_stream_url(args.url):
+        print(f"不是网络流地址: {args.url}", file=sys.stderr)
+        return 1
+    deadline = time.monotonic() + args.seconds
+    stream = ReconnectingStream(
+        args.url,
+        should_stop=lambda: time.monotonic() >= deadline,
+        status=lambda message: print(message, file=sys.stderr),
+        stall_timeout=args.stall_timeout,
+    )
+    frames = 0
+    start = time.monotonic()
+    try:
+        while stream.read() is not None:
+            frames += 1
+    finally:
+        stream.release()
+    seconds = time.monotonic() - start
+    print(
+        f"读取 {frames} 帧, {frames / seconds:.1f} 帧/秒, "
+        f"重连 {stream.reconnects} 次, 无响应 {stream.stalls} 次",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,17 +20,14 @@ def main():
 
     # 确保在 QApplication 创建后初始化主窗口
     main_window = YoloVisualizationApp()
-
-    # 在窗口显示前加载模型和类别
-    main_window.load_model_and_classes(initial_config["model_path"])
     if initial_config["selected_classes"]:
         main_window.selected_classes = initial_config["selected_classes"]
-        main_window.bird_detector.selected_classes = initial_config["selected_classes"]
     if initial_config["density_classes"]:
         main_window.density_classes = initial_config["density_classes"]
-        main_window.bird_detector.density_classes = initial_config["density_classes"]
 
     main_window.show()
+    # 窗口显示后在后台线程中加载模型，模型只加载一次
+    main_window.load_model_async(initial_config["model_path"])
     sys.exit(app.exec_())
 
 
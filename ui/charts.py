@@ -0,0 +1,162 @@
+"""
+图表组件模块 - 增量更新、限速刷新的实时数量密度图
+Creater Tz2H
+"""
+
+import time
+
+import matplotlib
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+from PyQt5.QtCore import QTimer
+from utils.timeseries import CountSeries
+
+
+def get_class_colors(count):
+    """获取类别曲线颜色，兼容新旧版本matplotlib"""
+    if hasattr(matplotlib, "colormaps"):
+        color_map = matplotlib.colormaps.get_cmap("tab10").resampled(max(1, count))
+    else:
+        import matplotlib.cm as cm
+
+        color_map = cm.get_cmap("tab10", max(1, count))
+    return [color_map(i) for i in range(count)]
+
+
+class LiveDensityChart(FigureCanvas):
+    """实时数量密度图
+
+    每个类别保留一条曲线，刷新时只更新曲线数据。横轴为距当前的秒数，
+    坐标轴范围固定，刷新时用blit只重绘曲线；只有类别或纵轴范围变化时
+    才完整重绘。刷新由定时器按 max_fps 触发，与视频帧率无关。
+    """
+
+    def __init__(
+        self,
+        window_seconds=60,
+        max_fps=4,
+        max_points=2000,
+        metrics=None,
+        parent=None,
+    ):
+        """初始化实时数量密度图
+
+        metrics为可选的耗时登记表，提供时记录每次刷新的耗时 (chart_update)。
+        """
+        self.fig = Figure()
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.ax = self.fig.add_subplot(111)
+        self.window_seconds = window_seconds
+        self.samples = CountSeries(capacity=max_points)  # 各类别逐帧数量
+        self.classes = []
+        self.lines = {}
+        self.y_max = 5
+        self.has_data = False
+        self.background = None
+        self.dirty = False
+        self.metrics = metrics
+        self.mpl_connect("draw_event", self.on_draw)
+        self.rebuild()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(int(1000 / max_fps))
+
+    def add_sample(self, class_counts, timestamp=None):
+        """添加一帧的各类别数量，实际绘制由定时器完成"""
+        self.samples.append(class_counts, timestamp)
+        self.dirty = True
+
+    def set_classes(self, classes):
+        """设置需要显示的类别，类别不变时不做任何操作"""
+        classes = sorted(classes)
+        if classes != self.classes:
+            self.classes = classes
+            self.samples.set_classes(classes)
+            self.rebuild()
+
+    def clear(self):
+        """清空数据"""
+        self.samples.clear()
+        self.y_max = 5
+        self.rebuild()
+
+    def rebuild(self):
+        """重新创建坐标轴和曲线，并完整重绘"""
+        self.ax.clear()
+        self.lines = {}
+        for cls, color in zip(self.classes, get_class_colors(len(self.classes))):
+            (line,) = self.ax.plot(
+                [],
+                [],
+                label=cls,
+                linewidth=2.5,
+                marker="o",
+                markersize=4,
+                color=color,
+                animated=True,
+            )
+            self.lines[cls] = line
+        self.ax.set_xlabel("时间 (秒)", fontsize=12)
+        self.ax.set_ylabel("数量", fontsize=12)
+        self.ax.grid(True, linestyle="--", alpha=0.4)
+        self.ax.set_xlim(-self.window_seconds, 0)
+        if self.lines:
+            self.ax.legend(
+                fontsize=12, loc="upper left", frameon=True, fancybox=True, shadow=True
+            )
+        self.update_axes()
+
+    def update_axes(self):
+        """更新纵轴范围和标题，并完整重绘"""
+        self.ax.set_ylim(0, self.y_max)
+        if self.has_data:
+            self.ax.set_title("数量密度分布", fontsize=14, fontweight="bold")
+        else:
+            self.ax.set_title("数量密度分布（暂无数据）")
+        self.background = None
+        self.draw()
+
+    def on_draw(self, event):
+        """完整重绘后缓存背景，并画上曲线"""
+        self.background = self.copy_from_bbox(self.ax.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        """绘制全部曲线"""
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def refresh(self):
+        """定时刷新：更新曲线数据并重绘"""
+        if not self.isVisible() or not (self.dirty or len(self.samples)):
+            return
+        if self.metrics is None:
+            self.update_lines()
+        else:
+            with self.metrics.measure("chart_update"):
+                self.update_lines()
+
+    def update_lines(self):
+        """更新曲线数据，必要时完整重绘，否则只blit曲线"""
+        self.dirty = False
+        now = time.time()
+        timestamps, counts = self.samples.ordered(since=now - self.window_seconds)
+        xs = timestamps - now
+        for i, line in enumerate(self.lines.values()):
+            line.set_data(xs, counts[:, i])
+        peak = int(counts.max()) if counts.size else 0
+        has_data = peak > 0
+        if peak > self.y_max or has_data != self.has_data:
+            # 纵轴范围或标题变化时完整重绘
+            self.has_data = has_data
+            while peak > self.y_max:
+                self.y_max *= 2
+            self.update_axes()
+            return
+        if self.background is None:
+            self.draw()
+            return
+        self.restore_region(self.background)
+        self.draw_lines()
+        self.blit(self.ax.bbox)
@@ -5,23 +5,30 @@ Creater Tz2H
 
 from PyQt5.QtWidgets import (
     QCheckBox,
+    QComboBox,
     QDialog,
     QFileDialog,
     QHBoxLayout,
     QLabel,
+    QMessageBox,
     QPushButton,
     QScrollArea,
     QVBoxLayout,
     QWidget,
 )
-from ultralytics import YOLO
+from utils.config_manager import DEFAULT_PROFILE, PROFILES
 
 
 class SettingsDialog(QDialog):
     """设置对话框"""
 
     def __init__(
-        self, parent=None, model_path=None, all_classes=None, selected_classes=None
+        self,
+        parent=None,
+        model_path=None,
+        all_classes=None,
+        selected_classes=None,
+        profile=DEFAULT_PROFILE,
     ):
         """初始化设置对话框"""
         super().__init__(parent)
@@ -44,6 +51,18 @@ class SettingsDialog(QDialog):
         model_layout.addWidget(self.model_btn)
         layout.addLayout(model_layout)
 
+        # 性能配置选择
+        profile_layout = QHBoxLayout()
+        self.profile_combo = QComboBox()
+        for name, options in PROFILES.items():
+            self.profile_combo.addItem(
+                f"{name} (输入 {options['imgsz']}, 置信度 {options['conf']})", name
+            )
+        self.profile_combo.setCurrentIndex(max(0, self.profile_combo.findData(profile)))
+        profile_layout.addWidget(QLabel("性能配置："))
+        profile_layout.addWidget(self.profile_combo, 1)
+        layout.addLayout(profile_layout)
+
         # 类别复选框区域
         self.scroll = QScrollArea()
         self.scroll.setWidgetResizable(True)
@@ -68,12 +87,20 @@ class SettingsDialog(QDialog):
     def choose_model(self):
         """选择模型文件"""
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择YOLO模型", "", "模型文件 (*.pt)"
+            self, "选择YOLO模型", "", "模型文件 (*.pt *.onnx *.xml)"
         )
         if file_path:
-            model = YOLO(file_path)
+            # 按需导入，.onnx 和 .xml 模型由ONNX Runtime或OpenVINO读取类别，
+            # 不需要加载torch
+            from bird_detector_app.backends import create_backend
+
+            try:
+                names = create_backend(file_path).names
+            except Exception as e:
+                QMessageBox.warning(self, "加载模型失败", f"无法读取模型类别: {e}")
+                return
             self.model_path = file_path
-            self.all_classes = list(model.names.values())
+            self.all_classes = list(names.values())
             self.result_model_path = file_path
             self.result_selected_classes = set(self.all_classes)  # 默认全选
             self.refresh_class_checkboxes()
@@ -105,6 +132,10 @@ class SettingsDialog(QDialog):
         """获取对话框结果"""
         return self.result_model_path, self.result_selected_classes
 
+    def get_profile(self):
+        """获取选择的性能配置名称"""
+        return self.profile_combo.currentData()
+
 
 class DensityDialog(QDialog):
     """密度图设置对话框"""
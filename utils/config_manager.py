@@ -5,6 +5,45 @@ Creater Tz2H
 
 import os
 
+# 性能配置：推理输入尺寸、置信度/IoU阈值、最大检测数、半精度 (仅GPU有效)
+# 以及摄像头采集分辨率，可在config.txt中用同名键覆盖单项
+PROFILES = {
+    "low-power": {
+        "imgsz": 320,
+        "conf": 0.35,
+        "iou": 0.5,
+        "max_det": 100,
+        "half": False,
+        "capture_size": (640, 480),
+    },
+    "balanced": {
+        "imgsz": 640,
+        "conf": 0.25,
+        "iou": 0.7,
+        "max_det": 300,
+        "half": False,
+        "capture_size": (640, 640),
+    },
+    "accuracy": {
+        "imgsz": 960,
+        "conf": 0.2,
+        "iou": 0.7,
+        "max_det": 300,
+        "half": True,
+        "capture_size": (1280, 720),
+    },
+}
+DEFAULT_PROFILE = "balanced"
+# 可覆盖的性能配置项及其类型
+PROFILE_KEYS = {"imgsz": int, "conf": float, "iou": float, "max_det": int}
+
+
+def get_profile(name, overrides=None):
+    """返回性能配置的参数，未知名称时使用默认配置"""
+    profile = dict(PROFILES.get(name, PROFILES[DEFAULT_PROFILE]))
+    profile.update(overrides or {})
+    return profile
+
 
 def load_initial_config():
     """加载初始配置"""
@@ -13,6 +52,34 @@ def load_initial_config():
         "model_path": "resources/models/yolo11m.pt",
         "selected_classes": set(),
         "density_classes": set(),
+        # 离线分析模式每次推理的帧数
+        "batch_size": 8,
+        # 每隔多少帧至少检测一次，1表示每帧检测
+        "infer_every": 1,
+        # 帧差阈值，大于0时画面变化超过阈值立即检测
+        "diff_threshold": 0.0,
+        # 运动门控：画面无变化时跳过推理，有变化时只检测运动区域
+        "motion_gate": False,
+        "motion_threshold": 16.0,
+        "motion_min_area": 0.001,
+        # 性能指标文件 (.prom 为Prometheus文本格式，其他为JSONL)，为空时不写入
+        "metrics_file": "",
+        "metrics_interval": 10.0,
+        # 逐帧结果文件格式：csv 或 parquet (需要pyarrow)
+        "results_format": "csv",
+        # 检测历史数据库 (SQLite)，为空时不记录
+        "history_db": os.path.join("results", "detections.db"),
+        # 性能配置名称 (见PROFILES) 及单项覆盖
+        "profile": DEFAULT_PROFILE,
+        "profile_overrides": {},
+        # 推理后端：ultralytics、onnxruntime 或 openvino (后两者需先导出模型)
+        "backend": "ultralytics",
+        # 推理线程数，0表示由后端决定
+        "threads": 0,
+        # "打开网络流"对话框中默认填入的地址
+        "stream_url": "",
+        # 模型精度：fp32 或 int8 (需先运行 bird_detector_app.quantize)
+        "precision": "fp32",
     }
 
     # 尝试从config.txt加载配置
@@ -30,22 +97,107 @@ def load_initial_config():
                             config["selected_classes"] = set(classes_str.split(","))
                             # 如果config有识别类别，密度图默认与识别类别一致
                             config["density_classes"] = set(config["selected_classes"])
+                    elif line.startswith("batch_size="):
+                        config["batch_size"] = max(1, int(line.split("=", 1)[1]))
+                    elif line.startswith("infer_every="):
+                        config["infer_every"] = max(1, int(line.split("=", 1)[1]))
+                    elif line.startswith("diff_threshold="):
+                        config["diff_threshold"] = float(line.split("=", 1)[1])
+                    elif line.startswith("motion_gate="):
+                        value = line.split("=", 1)[1].lower()
+                        config["motion_gate"] = value in ("1", "true", "on", "yes")
+                    elif line.startswith("motion_threshold="):
+                        config["motion_threshold"] = float(line.split("=", 1)[1])
+                    elif line.startswith("motion_min_area="):
+                        config["motion_min_area"] = float(line.split("=", 1)[1])
+                    elif line.startswith("metrics_file="):
+                        config["metrics_file"] = line.split("=", 1)[1]
+                    elif line.startswith("metrics_interval="):
+                        config["metrics_interval"] = float(line.split("=", 1)[1])
+                    elif line.startswith("results_format="):
+                        config["results_format"] = line.split("=", 1)[1].lower()
+                    elif line.startswith("history_db="):
+                        config["history_db"] = line.split("=", 1)[1]
+                    elif line.startswith("profile="):
+                        name = line.split("=", 1)[1]
+                        if name in PROFILES:
+                            config["profile"] = name
+                        else:
+                            print(f"未知的性能配置: {name}，使用 {DEFAULT_PROFILE}")
+                    elif line.startswith("backend="):
+                        config["backend"] = line.split("=", 1)[1].lower()
+                    elif line.startswith("stream_url="):
+                        config["stream_url"] = line.split("=", 1)[1]
+                    elif line.startswith("precision="):
+                        config["precision"] = line.split("=", 1)[1].lower()
+                    elif line.startswith("threads="):
+                        config["threads"] = max(0, int(line.split("=", 1)[1]))
+                    elif line.split("=", 1)[0] in PROFILE_KEYS:
+                        key, value = line.split("=", 1)
+                        config["profile_overrides"][key] = PROFILE_KEYS[key](value)
+                    elif line.startswith("half="):
+                        value = line.split("=", 1)[1].lower()
+                        half = value in ("1", "true", "on", "yes")
+                        config["profile_overrides"]["half"] = half
         except Exception as e:
             print(f"读取config.txt失败: {e}")
 
     return config
 
 
-def save_config(model_path, selected_classes, density_classes=None):
-    """保存配置到文件"""
+def save_config(model_path, selected_classes, density_classes=None, profile=None):
+    """保存配置到文件，profile不为None时同时保存性能配置名称"""
     config_file = "config.txt"
     try:
+        # 保留本函数不负责的其他配置项
+        extra_lines = []
+        if os.path.exists(config_file):
+            with open(config_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    key = line.split("=", 1)[0]
+                    if line and key not in ("model", "classes", "density"):
+                        if profile is None or key != "profile":
+                            extra_lines.append(line)
         with open(config_file, "w", encoding="utf-8") as f:
             f.write(f"model={model_path}\n")
             f.write("classes=" + ",".join(selected_classes) + "\n")
             if density_classes:
                 f.write("density=" + ",".join(density_classes) + "\n")
+            if profile is not None:
+                f.write(f"profile={profile}\n")
+            for line in extra_lines:
+                f.write(line + "\n")
         return True
     except Exception as e:
         print(f"保存config.txt失败: {e}")
         return False
+
+
+def load_camera_cache():
+    """读取上次检测到的可用摄像头列表"""
+    cache_file = "camera_cache.txt"
+    if not os.path.exists(cache_file):
+        return []
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("cameras="):
+                    cameras_str = line.split("=", 1)[1]
+                    return [int(c) for c in cameras_str.split(",") if c]
+    except Exception as e:
+        print(f"读取camera_cache.txt失败: {e}")
+    return []
+
+
+def save_camera_cache(cameras):
+    """保存可用摄像头列表，供下次启动时直接使用"""
+    cache_file = "camera_cache.txt"
+    try:
+        with open(cache_file, "w", encoding="utf-8") as f:
+            f.write("cameras=" + ",".join(str(c) for c in cameras) + "\n")
+        return True
+    except Exception as e:
+        print(f"保存camera_cache.txt失败: {e}")
+        return False
@@ -0,0 +1,117 @@
+"""
+时间序列工具模块 - 基于NumPy环形缓冲区的各类别数量历史
+Creater Tz2H
+"""
+
+import time
+
+import numpy as np
+
+
+class CountSeries:
+    """各类别数量的定长时间序列
+
+    时间戳保存在一维数组中，数量保存在 (容量, 类别数) 的矩阵中，写满后
+    覆盖最旧的数据。追加一帧为O(1)，窗口内的总和与历史最大值随追加更新，
+    不需要为每个数据点创建Python字典。
+    """
+
+    def __init__(self, classes=(), capacity=1000):
+        """初始化时间序列，capacity为最多保留的帧数"""
+        self.capacity = max(1, int(capacity))
+        self.classes = []
+        self.index = {}
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self.counts = np.zeros((self.capacity, 0), dtype=np.int32)
+        self.size = 0
+        self.head = 0
+        self.window_sum = np.zeros(0, dtype=np.int64)
+        self.peak = np.zeros(0, dtype=np.int32)
+        self.set_classes(classes)
+
+    def __len__(self):
+        """当前保存的帧数"""
+        return self.size
+
+    def set_classes(self, classes):
+        """设置类别列，已有数据中仍保留的类别列及其历史最大值会被保留"""
+        classes = list(classes)
+        if classes == self.classes:
+            return
+        timestamps, counts = self.ordered()
+        old_index = self.index
+        old_peak = self.peak
+        self.classes = classes
+        self.index = {cls: i for i, cls in enumerate(classes)}
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self.counts = np.zeros((self.capacity, len(classes)), dtype=np.int32)
+        self.size = len(timestamps)
+        self.head = self.size % self.capacity
+        self.timestamps[: self.size] = timestamps
+        for i, cls in enumerate(classes):
+            if cls in old_index:
+                self.counts[: self.size, i] = counts[:, old_index[cls]]
+        self.window_sum = self.counts[: self.size].sum(axis=0, dtype=np.int64)
+        # 新增类别的最大值从缓冲区内的数据算起，保留类别沿用历史最大值
+        self.peak = self.window_max()
+        for i, cls in enumerate(classes):
+            if cls in old_index:
+                self.peak[i] = max(self.peak[i], old_peak[old_index[cls]])
+
+    def clear(self):
+        """清空数据，保留类别列"""
+        self.size = 0
+        self.head = 0
+        self.window_sum[:] = 0
+        self.peak[:] = 0
+
+    def to_row(self, class_counts):
+        """把 {类别: 数量} 或按类别顺序排列的数量转换为一行"""
+        if isinstance(class_counts, dict):
+            return np.fromiter(
+                (class_counts.get(cls, 0) for cls in self.classes),
+                dtype=np.int32,
+                count=len(self.classes),
+            )
+        return np.asarray(class_counts, dtype=np.int32)
+
+    def append(self, class_counts, timestamp=None):
+        """追加一帧的各类别数量"""
+        row = self.to_row(class_counts)
+        if self.size == self.capacity:
+            # 覆盖最旧的一帧
+            self.window_sum -= self.counts[self.head]
+        else:
+            self.size += 1
+        self.counts[self.head] = row
+        self.timestamps[self.head] = time.time() if timestamp is None else timestamp
+        self.window_sum += row
+        np.maximum(self.peak, row, out=self.peak)
+        self.head = (self.head + 1) % self.capacity
+
+    def mean(self):
+        """缓冲区内各类别的平均数量"""
+        if self.size == 0:
+            return np.zeros(len(self.classes))
+        return self.window_sum / self.size
+
+    def window_max(self):
+        """缓冲区内各类别的最大数量"""
+        if self.size == 0:
+            return np.zeros(len(self.classes), dtype=np.int32)
+        return self.counts[: self.size].max(axis=0)
+
+    def ordered(self, since=None):
+        """按时间顺序返回 (时间戳数组, 数量矩阵)，since限定起始时间"""
+        if self.size < self.capacity or self.head == 0:
+            timestamps = self.timestamps[: self.size]
+            counts = self.counts[: self.size]
+        else:
+            order = np.r_[self.head : self.capacity, 0 : self.head]
+            timestamps = self.timestamps[order]
+            counts = self.counts[order]
+        if since is not None:
+            start = np.searchsorted(timestamps, since)
+            timestamps = timestamps[start:]
+            counts = counts[start:]
+        return timestamps, counts